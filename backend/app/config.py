@@ -16,9 +16,22 @@ class Settings(BaseSettings):
     MILVUS_COLLECTION: str = "documents"
     MILVUS_DIMENSION: int = 384
     
+    # Vector index: "IVF_SQ8" (8-bit scalar quantization), "IVF_PQ" or "HNSW"
+    MILVUS_INDEX_TYPE: str = "IVF_SQ8"
+    MILVUS_NLIST: int = 128
+    MILVUS_NPROBE: int = 16
+    
+    # HNSW index tuning (recall vs. latency)
+    MILVUS_HNSW_M: int = 16
+    MILVUS_HNSW_EF_CONSTRUCTION: int = 200
+    MILVUS_HNSW_EF: int = 64  # minimum ef at search time
+    
     # Embedding Settings
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DEVICE: str = "cpu"
+    EMBEDDING_QUANTIZE: bool = False  # fp16 on CUDA, dynamic int8 on CPU; reindex all documents after changing
+    EMBEDDING_BACKEND: str = "torch"  # "torch" or "onnx" (requires optimum[onnxruntime])
+    EMBEDDING_ONNX_PATH: str = ""  # pre-exported ONNX model dir; exported on load if empty
     
     # LLM Settings
     LLM_PROVIDER: str = "gemini"  # "openai", "gemini"
@@ -34,19 +47,37 @@ class Settings(BaseSettings):
     # General LLM Settings
     LLM_MAX_TOKENS: int = 1000
     LLM_TEMPERATURE: float = 0.7
+    LLM_MAX_CONCURRENCY: int = 8  # in-flight provider requests
+    LLM_CONTEXT_WINDOW: int = 0  # prompt + completion tokens; 0 = provider default
+    
+    # LLM answer cache (only used when LLM_TEMPERATURE == 0)
+    LLM_CACHE_BACKEND: str = "memory"  # "memory", "redis" or "none"
+    LLM_CACHE_TTL: int = 3600  # seconds
+    LLM_CACHE_MAX_ENTRIES: int = 1024
+    REDIS_URL: str = "redis://localhost:6379/0"
     
     # Chunking Settings
     CHUNK_SIZE: int = 500
     CHUNK_OVERLAP: int = 50
     
+    # Ingestion Settings
+    INGESTION_STATUS_MAX_ENTRIES: int = 1024
+    INGESTION_STATUS_TTL: int = 3600  # seconds
+    
     # RAG Settings
     TOP_K_RESULTS: int = 5
     SIMILARITY_THRESHOLD: float = 0.5
+    HEALTH_CACHE_TTL: float = 2.0  # seconds
+    
+    # Semantic query cache (cleared whenever documents change)
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_THRESHOLD: float = 0.97  # min cosine similarity for a hit
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1024
     
     # File Upload Settings
     UPLOAD_DIR: str = "./uploads"
+    METADATA_DB_PATH: str = "./data/metadata.db"  # chunk text side store
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
-    ALLOWED_EXTENSIONS: list = [".pdf"]
     
     class Config:
         env_file = ".env"
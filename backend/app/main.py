@@ -1,8 +1,12 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from app.routers import documents, ingest, query
 from app.config import get_settings
+from app.services.pdf_service import get_pdf_service
+from app.services.rag_pipeline import get_rag_pipeline
+import asyncio
 import logging
 import sys
 
@@ -24,7 +28,8 @@ settings = get_settings()
 app = FastAPI(
     title=settings.API_TITLE,
     version=settings.API_VERSION,
-    description="RAG-based Q&A system with PDF document processing and Milvus vector database"
+    description="RAG-based Q&A system with PDF document processing and Milvus vector database",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -36,6 +41,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (document listings, retrieved chunk texts) for
+# clients that accept gzip. The SSE/NDJSON streams opt out by setting
+# Content-Encoding: identity, since gzip would buffer their events.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Include routers
 app.include_router(documents.router)
 app.include_router(ingest.router)
@@ -49,12 +59,24 @@ async def startup_event():
     logger.info(f"Milvus host: {settings.MILVUS_HOST}:{settings.MILVUS_PORT}")
     logger.info(f"Embedding model: {settings.EMBEDDING_MODEL}")
     logger.info(f"LLM provider: {settings.LLM_PROVIDER}")
+    
+    # Build the shared pipeline and warm it up before the first request
+    loop = asyncio.get_running_loop()
+    pipeline = await loop.run_in_executor(None, get_rag_pipeline)
+    await loop.run_in_executor(None, pipeline.warmup)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info("Shutting down RAG Q&A System API...")
+    get_pdf_service().shutdown()
+    
+    pipeline = get_rag_pipeline()
+    await pipeline.llm_client.aclose()
+    
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, pipeline.shutdown)
 
 
 @app.get("/")
@@ -87,7 +109,7 @@ async def health():
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for unhandled errors."""
     logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "success": False,
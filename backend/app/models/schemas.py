@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -38,6 +38,9 @@ class QueryRequest(BaseModel):
 
 
 class RetrievedChunk(BaseModel):
+    # Documents /query/ask, which serializes the pipeline output directly
+    model_config = ConfigDict(extra="ignore", frozen=True)
+    
     text: str
     score: float
     metadata: Dict[str, Any]
@@ -52,6 +55,9 @@ class QueryResponse(BaseModel):
 
 
 class DocumentInfo(BaseModel):
+    # Instances are shared by the cached document listing
+    model_config = ConfigDict(extra="ignore", frozen=True)
+    
     document_id: str
     filename: str
     upload_date: datetime
@@ -64,6 +70,16 @@ class DocumentListResponse(BaseModel):
     total_count: int
 
 
+class DocumentCountResponse(BaseModel):
+    success: bool
+    total_count: int
+
+
+class DocumentEtagResponse(BaseModel):
+    success: bool
+    etag: str
+
+
 class DeleteDocumentResponse(BaseModel):
     success: bool
     message: str
@@ -1,28 +1,70 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
+from fastapi import APIRouter, UploadFile, File, HTTPException, status, Depends
 from fastapi.responses import JSONResponse
 from app.models.schemas import (
     DocumentUploadResponse,
     DocumentListResponse,
+    DocumentCountResponse,
+    DocumentEtagResponse,
     DeleteDocumentResponse,
     DocumentInfo
 )
-from app.services.pdf_service import PDFService
-from app.services.rag_pipeline import RAGPipeline
+from app.services.pdf_service import (
+    PDFService,
+    FileTooLargeError,
+    PDF_MAGIC,
+    get_pdf_service
+)
+from app.services.rag_pipeline import RAGPipeline, get_rag_pipeline
 from app.config import get_settings
 from datetime import datetime
+from functools import lru_cache
+from typing import Tuple
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/documents", tags=["Documents"])
 
 # Initialize services
 settings = get_settings()
-pdf_service = PDFService(upload_dir=settings.UPLOAD_DIR)
-rag_pipeline = RAGPipeline()
+
+# Hot-path settings resolved once
+_MAX_FILE_SIZE = settings.MAX_FILE_SIZE
+
+# docs_version restarts at 0 with the process, so etags carry a per-process id
+_INSTANCE_ID = uuid.uuid4().hex[:8]
+
+
+@lru_cache(maxsize=8)
+def _list_cached(rag_pipeline: RAGPipeline, version: int) -> Tuple[DocumentInfo, ...]:
+    """
+    Build the sorted document listing for a given docs_version.
+    A new version (after ingest/delete) misses the cache; old ones age out.
+    """
+    documents = rag_pipeline.get_all_documents()
+    
+    # Convert to DocumentInfo models
+    document_infos = [
+        DocumentInfo(
+            document_id=doc["document_id"],
+            filename=doc["filename"],
+            upload_date=datetime.fromtimestamp(doc["upload_timestamp"]),
+            chunk_count=doc["chunk_count"]
+        )
+        for doc in documents
+    ]
+    
+    # Sort by upload date (newest first)
+    document_infos.sort(key=lambda x: x.upload_date, reverse=True)
+    
+    return tuple(document_infos)
 
 
 @router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(
+    file: UploadFile = File(...),
+    pdf_service: PDFService = Depends(get_pdf_service)
+):
     """
     Upload a PDF document.
     
@@ -30,31 +72,27 @@ async def upload_document(file: UploadFile = File(...)):
     Use /ingest endpoint to process and index the document.
     """
     try:
-        # Validate file type
-        if not file.filename.endswith('.pdf'):
+        # Validate PDF header before touching the disk (filenames can lie)
+        if await file.read(len(PDF_MAGIC)) != PDF_MAGIC:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Only PDF files are allowed"
             )
+        await file.seek(0)
         
-        # Check file size
-        content = await file.read()
-        if len(content) > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"File size exceeds maximum allowed size of {settings.MAX_FILE_SIZE} bytes"
+        # Stream file to disk, checking size on the way
+        try:
+            doc_info = await pdf_service.save_uploaded_file(
+                file,
+                file.filename,
+                max_size=_MAX_FILE_SIZE
             )
-        
-        # Validate PDF
-        if not content.startswith(b'%PDF-'):
+        except FileTooLargeError as e:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid PDF file"
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
             )
         
-        # Save file
-        doc_info = pdf_service.save_uploaded_file(content, file.filename)
-        
         logger.info(f"Document uploaded: {doc_info['document_id']}")
         
         return DocumentUploadResponse(
@@ -75,30 +113,16 @@ async def upload_document(file: UploadFile = File(...)):
 
 
 @router.get("/list", response_model=DocumentListResponse)
-async def list_documents():
+def list_documents(rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)):
     """
     List all documents in the system with their metadata.
     """
     try:
-        documents = rag_pipeline.get_all_documents()
-        
-        # Convert to DocumentInfo models
-        document_infos = [
-            DocumentInfo(
-                document_id=doc["document_id"],
-                filename=doc["filename"],
-                upload_date=datetime.fromtimestamp(doc["upload_timestamp"]),
-                chunk_count=doc["chunk_count"]
-            )
-            for doc in documents
-        ]
-        
-        # Sort by upload date (newest first)
-        document_infos.sort(key=lambda x: x.upload_date, reverse=True)
+        document_infos = _list_cached(rag_pipeline, rag_pipeline.docs_version)
         
         return DocumentListResponse(
             success=True,
-            documents=document_infos,
+            documents=list(document_infos),
             total_count=len(document_infos)
         )
     
@@ -110,8 +134,44 @@ async def list_documents():
         )
 
 
+@router.get("/count", response_model=DocumentCountResponse)
+def count_documents(rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)):
+    """
+    Number of documents in the system (same source as /list, without the payload).
+    """
+    try:
+        document_infos = _list_cached(rag_pipeline, rag_pipeline.docs_version)
+        
+        return DocumentCountResponse(
+            success=True,
+            total_count=len(document_infos)
+        )
+    
+    except Exception as e:
+        logger.error(f"Error counting documents: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error counting documents: {str(e)}"
+        )
+
+
+@router.get("/etag", response_model=DocumentEtagResponse)
+def documents_etag(rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)):
+    """
+    Opaque tag that changes whenever documents are ingested or deleted.
+    Lets clients cache listings and counts until it changes.
+    """
+    return DocumentEtagResponse(
+        success=True,
+        etag=f"{_INSTANCE_ID}-{rag_pipeline.docs_version}"
+    )
+
+
 @router.delete("/{document_id}", response_model=DeleteDocumentResponse)
-async def delete_document(document_id: str):
+def delete_document(
+    document_id: str,
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
     """
     Delete a document and all its associated chunks from the system.
     """
@@ -142,7 +202,10 @@ async def delete_document(document_id: str):
 
 
 @router.get("/{document_id}/info")
-async def get_document_info(document_id: str):
+def get_document_info(
+    document_id: str,
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
     """
     Get detailed information about a specific document.
     """
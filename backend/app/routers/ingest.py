@@ -1,44 +1,75 @@
-from fastapi import APIRouter, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends
+from fastapi.responses import StreamingResponse
 from app.models.schemas import IngestRequest, IngestResponse
-from app.services.rag_pipeline import RAGPipeline
+from app.services.rag_pipeline import RAGPipeline, get_rag_pipeline
+from app.config import get_settings
+from cachetools import TTLCache
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, Optional
+import asyncio
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/ingest", tags=["Ingest"])
 
-# Initialize RAG pipeline
-rag_pipeline = RAGPipeline()
+settings = get_settings()
 
-# Store ingestion status
-ingestion_status = {}
+# Store ingestion status (bounded, finished jobs age out)
+ingestion_status = TTLCache(
+    maxsize=settings.INGESTION_STATUS_MAX_ENTRIES,
+    ttl=settings.INGESTION_STATUS_TTL
+)
+_status_lock = Lock()
 
 
-def process_ingestion(document_id: str, filename: str):
+def set_ingestion_status(document_id: str, **fields: Any):
+    """Record the status of an ingestion job."""
+    with _status_lock:
+        ingestion_status[document_id] = fields
+
+
+def get_ingestion_status_entry(document_id: str) -> Optional[Dict[str, Any]]:
+    """Return the recorded status of an ingestion job, if still cached."""
+    with _status_lock:
+        return ingestion_status.get(document_id)
+
+
+def process_ingestion(rag_pipeline: RAGPipeline, document_id: str, filename: str):
     """
     Background task for document ingestion.
     """
     try:
-        ingestion_status[document_id] = {"status": "processing", "progress": 0}
+        set_ingestion_status(document_id, status="processing", progress=0)
         
-        result = rag_pipeline.ingest_document(document_id, filename)
+        def on_progress(stage: str, percent: int):
+            set_ingestion_status(document_id, status="processing", stage=stage, progress=percent)
         
-        ingestion_status[document_id] = {
-            "status": "completed",
-            "progress": 100,
-            "result": result
-        }
+        result = rag_pipeline.ingest_document(document_id, filename, progress_callback=on_progress)
+        
+        set_ingestion_status(
+            document_id,
+            status="completed",
+            progress=100,
+            result=result
+        )
     
     except Exception as e:
         logger.error(f"Background ingestion failed: {str(e)}")
-        ingestion_status[document_id] = {
-            "status": "failed",
-            "progress": 0,
-            "error": str(e)
-        }
+        set_ingestion_status(
+            document_id,
+            status="failed",
+            progress=0,
+            error=str(e)
+        )
 
 
 @router.post("/process", response_model=IngestResponse)
-async def ingest_document(request: IngestRequest, background_tasks: BackgroundTasks):
+async def ingest_document(
+    request: IngestRequest,
+    background_tasks: BackgroundTasks,
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
     """
     Process and ingest a previously uploaded document.
     
@@ -53,8 +84,8 @@ async def ingest_document(request: IngestRequest, background_tasks: BackgroundTa
     try:
         logger.info(f"Starting ingestion for document: {request.document_id}")
         
-        # For synchronous processing (recommended for moderate-sized documents)
-        result = rag_pipeline.ingest_document(
+        # Extract, embed and index stages run concurrently
+        result = await rag_pipeline.ingest_document_async(
             document_id=request.document_id,
             filename=request.filename
         )
@@ -80,8 +111,66 @@ async def ingest_document(request: IngestRequest, background_tasks: BackgroundTa
         )
 
 
+@router.post("/process-stream")
+async def ingest_document_stream(
+    request: IngestRequest,
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
+    """
+    Process and ingest a document, streaming progress as NDJSON.
+    
+    Emits one JSON object per line:
+    - {"stage": "extract"|"embed"|"index", "percent": int} while processing
+    - {"stage": "done", "percent": 100, "chunks_processed": ..., "embeddings_created": ...}
+    - {"stage": "error", "detail": "..."} if ingestion fails
+    """
+    logger.info(f"Starting streamed ingestion for document: {request.document_id}")
+    
+    async def events() -> AsyncIterator[bytes]:
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        def on_progress(stage: str, percent: int):
+            queue.put_nowait({"stage": stage, "percent": percent})
+        
+        task = asyncio.ensure_future(rag_pipeline.ingest_document_async(
+            request.document_id,
+            request.filename,
+            on_progress
+        ))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        
+        while (event := await queue.get()) is not None:
+            yield orjson.dumps(event) + b"\n"
+        
+        try:
+            result = task.result()
+            event = {
+                "stage": "done",
+                "percent": 100,
+                "document_id": request.document_id,
+                "chunks_processed": result["chunks_created"],
+                "embeddings_created": result["embeddings_generated"]
+            }
+        except Exception as e:
+            logger.error(f"Error ingesting document: {str(e)}")
+            event = {"stage": "error", "detail": f"Error ingesting document: {str(e)}"}
+        
+        yield orjson.dumps(event) + b"\n"
+    
+    # Content-Encoding set, so GZipMiddleware doesn't buffer the progress events
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={"Content-Encoding": "identity"}
+    )
+
+
 @router.post("/process-async", response_model=dict)
-async def ingest_document_async(request: IngestRequest, background_tasks: BackgroundTasks):
+async def ingest_document_async(
+    request: IngestRequest,
+    background_tasks: BackgroundTasks,
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
     """
     Process and ingest a document in the background.
     Use this for very large documents.
@@ -90,14 +179,12 @@ async def ingest_document_async(request: IngestRequest, background_tasks: Backgr
         # Start background task
         background_tasks.add_task(
             process_ingestion,
+            rag_pipeline,
             request.document_id,
             request.filename
         )
         
-        ingestion_status[request.document_id] = {
-            "status": "queued",
-            "progress": 0
-        }
+        set_ingestion_status(request.document_id, status="queued", progress=0)
         
         return {
             "success": True,
@@ -119,7 +206,9 @@ async def get_ingestion_status(document_id: str):
     """
     Get the status of a background ingestion task.
     """
-    if document_id not in ingestion_status:
+    entry = get_ingestion_status_entry(document_id)
+    
+    if entry is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No ingestion status found for document: {document_id}"
@@ -128,35 +217,36 @@ async def get_ingestion_status(document_id: str):
     return {
         "success": True,
         "document_id": document_id,
-        **ingestion_status[document_id]
+        **entry
     }
 
 
 @router.post("/reindex/{document_id}")
-async def reindex_document(document_id: str):
+def reindex_document(
+    document_id: str,
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
     """
     Reindex an existing document (useful if chunking strategy changes).
     """
     try:
-        # First delete existing chunks
-        delete_result = rag_pipeline.delete_document(document_id)
-        
-        if delete_result["deleted_chunks"] == 0:
+        # Get the original filename recorded at upload
+        filename = rag_pipeline.pdf_service.get_filename(document_id)
+        if not filename:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Document not found: {document_id}"
+                detail=f"Document file not found: {document_id}"
             )
         
-        # Get filename from file system
-        file_path = rag_pipeline.pdf_service.get_file_path(document_id)
-        if not file_path:
+        # Delete existing chunks, keeping the PDF for re-ingestion
+        delete_result = rag_pipeline.delete_document(document_id, delete_file=False)
+        
+        if delete_result["deleted_chunks"] == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Document file not found: {document_id}"
+                detail=f"Document not found: {document_id}"
             )
         
-        filename = file_path.split('_', 1)[1]
-        
         # Re-ingest
         result = rag_pipeline.ingest_document(document_id, filename)
         
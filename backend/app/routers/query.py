@@ -1,19 +1,40 @@
-from fastapi import APIRouter, HTTPException, status
-from app.models.schemas import QueryRequest, QueryResponse, RetrievedChunk
-from app.services.rag_pipeline import RAGPipeline
+from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from app.models.schemas import QueryRequest, QueryResponse
+from app.services.rag_pipeline import RAGPipeline, get_rag_pipeline
 from app.config import get_settings
+from cachetools import TTLCache, cached
+from threading import Lock
+from typing import Any, AsyncIterator, Dict
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/query", tags=["Query"])
 
 # Initialize services
 settings = get_settings()
-rag_pipeline = RAGPipeline()
 
+# Hot-path settings resolved once
+_SIMILARITY_THRESHOLD = settings.SIMILARITY_THRESHOLD
 
-@router.post("/ask", response_model=QueryResponse)
-async def ask_question(request: QueryRequest):
+# Health results are reused briefly so frequent probes don't hit Milvus each time
+_health_cache = TTLCache(maxsize=1, ttl=settings.HEALTH_CACHE_TTL)
+_health_lock = Lock()
+
+
+@cached(_health_cache, lock=_health_lock)
+def _cached_health(rag_pipeline: RAGPipeline) -> Dict[str, Any]:
+    return rag_pipeline.health_check()
+
+
+# Serialized directly: response_model would re-validate the trusted pipeline
+# output, so QueryResponse only documents the schema
+@router.post("/ask", response_model=None, responses={200: {"model": QueryResponse}})
+async def ask_question(
+    request: QueryRequest,
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
     """
     Ask a question and get an answer based on indexed documents.
     
@@ -35,28 +56,28 @@ async def ask_question(request: QueryRequest):
         logger.info(f"Processing question: {request.question[:100]}...")
         
         # Execute RAG pipeline
-        result = rag_pipeline.query(
+        result = await rag_pipeline.query(
             question=request.question,
             top_k=request.top_k
         )
         
-        # Format retrieved chunks
+        # Format retrieved chunks (pipeline output is trusted, no validation)
         retrieved_chunks = [
-            RetrievedChunk(
-                text=chunk["text"],
-                score=chunk["score"],
-                metadata=chunk["metadata"]
-            )
+            {
+                "text": chunk["text"],
+                "score": chunk["score"],
+                "metadata": chunk["metadata"]
+            }
             for chunk in result["retrieved_chunks"]
         ]
         
-        return QueryResponse(
-            success=True,
-            question=request.question,
-            answer=result["answer"],
-            retrieved_chunks=retrieved_chunks,
-            processing_time=result["processing_time"]
-        )
+        return ORJSONResponse({
+            "success": True,
+            "question": request.question,
+            "answer": result["answer"],
+            "retrieved_chunks": retrieved_chunks,
+            "processing_time": result["processing_time"]
+        })
     
     except HTTPException:
         raise
@@ -68,8 +89,75 @@ async def ask_question(request: QueryRequest):
         )
 
 
+def _sse_event(event: Dict[str, Any]) -> bytes:
+    return b"data: " + orjson.dumps(event) + b"\n\n"
+
+
+@router.post("/ask_stream")
+async def ask_question_stream(
+    request: QueryRequest,
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
+    """
+    Streaming variant of /ask, as Server-Sent Events.
+    
+    Emits, as JSON "data:" lines:
+    1. {"type": "chunks", "retrieved_chunks": [...]} once retrieval is done
+    2. {"type": "delta", "delta": "..."} for each piece of the answer
+    3. {"type": "done", "processing_time": ...} at the end
+    Errors after the stream has started are sent as {"type": "error", "detail": "..."}.
+    """
+    if not request.question.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Question cannot be empty"
+        )
+    
+    logger.info(f"Processing streaming question: {request.question[:100]}...")
+    
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for event in rag_pipeline.query_stream(
+                question=request.question,
+                top_k=request.top_k
+            ):
+                if event["type"] == "chunks":
+                    # Same shape as QueryResponse.retrieved_chunks
+                    event = {
+                        "type": "chunks",
+                        "retrieved_chunks": [
+                            {
+                                "text": chunk["text"],
+                                "score": chunk["score"],
+                                "metadata": chunk["metadata"]
+                            }
+                            for chunk in event["retrieved_chunks"]
+                        ]
+                    }
+                yield _sse_event(event)
+        
+        except Exception as e:
+            logger.error(f"Error processing streaming query: {str(e)}")
+            yield _sse_event({"type": "error", "detail": f"Error processing query: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            # GZipMiddleware passes through responses that set an encoding;
+            # compressing would buffer events until the stream ends
+            "Content-Encoding": "identity"
+        }
+    )
+
+
 @router.post("/search")
-async def semantic_search(request: QueryRequest):
+def semantic_search(
+    request: QueryRequest,
+    rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)
+):
     """
     Perform semantic search without LLM generation.
     Returns only the most relevant chunks.
@@ -95,7 +183,7 @@ async def semantic_search(request: QueryRequest):
         # Filter by threshold
         filtered_results = [
             result for result in search_results
-            if result["score"] >= settings.SIMILARITY_THRESHOLD
+            if result["score"] >= _SIMILARITY_THRESHOLD
         ]
         
         return {
@@ -114,12 +202,12 @@ async def semantic_search(request: QueryRequest):
 
 
 @router.get("/health")
-async def health_check():
+def health_check(rag_pipeline: RAGPipeline = Depends(get_rag_pipeline)):
     """
     Check health status of the RAG system.
     """
     try:
-        health_info = rag_pipeline.health_check()
+        health_info = _cached_health(rag_pipeline)
         
         return {
             "success": True,
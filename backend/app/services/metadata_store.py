@@ -0,0 +1,163 @@
+from typing import Any, Dict, Iterable, List
+from pathlib import Path
+from functools import lru_cache
+from app.config import get_settings
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataStore:
+    """
+    Local SQLite side store for chunk texts, keyed by Milvus primary key,
+    and for per-document metadata (the document listing).
+    Keeps the large text payload out of Milvus search responses.
+    """
+    
+    def __init__(self, db_path: str = "./data/metadata.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(exist_ok=True, parents=True)
+        
+        # One shared connection; sqlite serializes writes anyway
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._init_schema()
+        
+        logger.info(f"Metadata store opened at {self.db_path}")
+    
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    chunk_text TEXT NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks (document_id)"
+            )
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    document_id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL,
+                    upload_timestamp INTEGER NOT NULL,
+                    chunk_count INTEGER NOT NULL
+                )
+                """
+            )
+    
+    def put_chunks(self, ids: Iterable[int], document_id: str, texts: Iterable[str]):
+        """Store chunk texts under their Milvus ids."""
+        rows = [(int(chunk_id), document_id, text) for chunk_id, text in zip(ids, texts)]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, document_id, chunk_text) VALUES (?, ?, ?)",
+                rows
+            )
+    
+    def add_document_chunks(
+        self,
+        document_id: str,
+        filename: str,
+        upload_timestamp: int,
+        ids: Iterable[int],
+        texts: Iterable[str]
+    ):
+        """
+        Store a batch of chunk texts and count them in the documents table,
+        in one transaction.
+        """
+        rows = [(int(chunk_id), document_id, text) for chunk_id, text in zip(ids, texts)]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (id, document_id, chunk_text) VALUES (?, ?, ?)",
+                rows
+            )
+            self._conn.execute(
+                """
+                INSERT INTO documents (document_id, filename, upload_timestamp, chunk_count)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (document_id)
+                DO UPDATE SET chunk_count = chunk_count + excluded.chunk_count
+                """,
+                (document_id, filename, upload_timestamp, len(rows))
+            )
+    
+    def get_documents(self) -> List[Dict[str, Any]]:
+        """Return all documents with their chunk counts."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT document_id, filename, upload_timestamp, chunk_count FROM documents"
+            ).fetchall()
+        return [
+            {
+                "document_id": document_id,
+                "filename": filename,
+                "upload_timestamp": upload_timestamp,
+                "chunk_count": chunk_count
+            }
+            for document_id, filename, upload_timestamp, chunk_count in rows
+        ]
+    
+    def has_documents(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone() is not None
+    
+    def put_documents(self, documents: Iterable[Dict[str, Any]]):
+        """Insert or overwrite document rows (used to backfill from Milvus)."""
+        rows = [
+            (doc["document_id"], doc["filename"], doc["upload_timestamp"], doc["chunk_count"])
+            for doc in documents
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO documents (document_id, filename, upload_timestamp, chunk_count)
+                VALUES (?, ?, ?, ?)
+                """,
+                rows
+            )
+    
+    def get_texts(self, ids: List[int]) -> Dict[int, str]:
+        """Fetch chunk texts for the given ids in a single query."""
+        if not ids:
+            return {}
+        
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, chunk_text FROM chunks WHERE id IN ({placeholders})",
+                [int(chunk_id) for chunk_id in ids]
+            ).fetchall()
+        return dict(rows)
+    
+    def delete_document(self, document_id: str) -> int:
+        """Remove a document and all its chunk texts."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM chunks WHERE document_id = ?",
+                (document_id,)
+            )
+            self._conn.execute(
+                "DELETE FROM documents WHERE document_id = ?",
+                (document_id,)
+            )
+        return cursor.rowcount
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache(maxsize=1)
+def get_metadata_store() -> MetadataStore:
+    """Return the shared metadata store."""
+    return MetadataStore(db_path=get_settings().METADATA_DB_PATH)
@@ -1,27 +1,148 @@
-import PyPDF2
+from pypdf import PdfReader
 import pdfplumber
-from typing import List, Dict, Optional
+import pypdfium2 as pdfium
+from typing import List, Dict, Iterator, Optional, Tuple
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import multiprocessing
+import threading
 import os
 from pathlib import Path
 import uuid
 import logging
+import aiofiles
+from fastapi import UploadFile
+from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Buffer size used when streaming uploads to disk
+COPY_BUFFER_SIZE = 1024 * 1024
+PDF_MAGIC = b'%PDF-'
+
+# Minimum pages handled per worker task, so re-opening the PDF is amortized
+MIN_PAGES_PER_TASK = 8
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an uploaded file exceeds the size limit."""
+
+
+def _count_pages(method: str, file_path: str) -> int:
+    """Return the number of pages using the given extraction backend."""
+    if method == "pdfium":
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    elif method == "pdfplumber":
+        with pdfplumber.open(file_path) as pdf:
+            return len(pdf.pages)
+    else:
+        with open(file_path, 'rb') as file:
+            return len(PdfReader(file).pages)
+
+
+def _extract_page_range(method: str, file_path: str, start: int, end: int) -> List[Dict[str, any]]:
+    """
+    Extract text from pages [start, end) of a PDF.
+    Runs inside pool workers, so the document is opened fresh on every call:
+    open PDF handles cannot be shared across processes.
+    """
+    pages_data = []
+    
+    def add_page(page_num: int, text: Optional[str]):
+        if text and text.strip():
+            pages_data.append({
+                "page_number": page_num + 1,
+                "text": text
+            })
+    
+    if method == "pdfium":
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            for page_num in range(start, end):
+                page = pdf[page_num]
+                textpage = page.get_textpage()
+                add_page(page_num, textpage.get_text_range())
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+    
+    elif method == "pdfplumber":
+        with pdfplumber.open(file_path, pages=list(range(start + 1, end + 1))) as pdf:
+            for page in pdf.pages:
+                add_page(page.page_number - 1, page.extract_text())
+    
+    else:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PdfReader(file)
+            for page_num in range(start, end):
+                add_page(page_num, pdf_reader.pages[page_num].extract_text())
+    
+    return pages_data
+
 
 class PDFService:
     """
     Service for handling PDF file operations.
-    Supports extraction with both PyPDF2 and pdfplumber.
+    Supports extraction with pypdfium2 (default), pdfplumber and pypdf.
     """
     
-    def __init__(self, upload_dir: str = "./uploads"):
+    def __init__(self, upload_dir: str = "./uploads", max_workers: Optional[int] = None):
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(exist_ok=True, parents=True)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        
+        # document_id -> (stored file, sanitized filename), built with a single directory scan
+        self._index: Dict[str, Tuple[Path, str]] = {}
+        self._index_lock = threading.Lock()
+        self._build_index()
     
-    def save_uploaded_file(self, file_content: bytes, filename: str) -> Dict[str, str]:
+    def _build_index(self):
+        """Index stored uploads by the document_id prefix of their filename."""
+        for file_path in self.upload_dir.iterdir():
+            if file_path.is_file() and "_" in file_path.name:
+                document_id, filename = file_path.name.split("_", 1)
+                self._index[document_id] = (file_path, filename)
+        
+        logger.info(f"Indexed {len(self._index)} stored files in {self.upload_dir}")
+    
+    def _lookup(self, document_id: str) -> Optional[Tuple[Path, str]]:
+        """
+        Index entry for document_id. The index is per process, so on a miss
+        (or a file removed meanwhile) the upload dir is checked for files
+        saved or deleted by other workers.
         """
-        Save uploaded PDF file and return document info.
+        with self._index_lock:
+            entry = self._index.get(document_id)
+        if entry is not None and entry[0].exists():
+            return entry
+        
+        file_path = next(self.upload_dir.glob(f"{document_id}_*"), None)
+        with self._index_lock:
+            if file_path is None:
+                self._index.pop(document_id, None)
+                return None
+            entry = (file_path, file_path.name.split("_", 1)[1])
+            self._index[document_id] = entry
+        return entry
+    
+    async def save_uploaded_file(
+        self,
+        upload: UploadFile,
+        filename: str,
+        max_size: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        Stream uploaded PDF file to disk and return document info.
+        The size limit is checked while copying, so the upload is never
+        fully buffered in memory; disk writes don't block the event loop.
         """
         # Generate unique document ID
         document_id = str(uuid.uuid4())
@@ -31,10 +152,27 @@ class PDFService:
         file_path = self.upload_dir / f"{document_id}_{safe_filename}"
         
         # Save file
-        with open(file_path, "wb") as f:
-            f.write(file_content)
+        total_bytes = 0
+        try:
+            async with aiofiles.open(file_path, "wb", buffering=COPY_BUFFER_SIZE) as f:
+                while chunk := await upload.read(COPY_BUFFER_SIZE):
+                    total_bytes += len(chunk)
+                    if max_size is not None and total_bytes > max_size:
+                        raise FileTooLargeError(
+                            f"File size exceeds maximum allowed size of {max_size} bytes"
+                        )
+                    
+                    await f.write(chunk)
+        
+        except Exception:
+            # Never leave partial uploads behind
+            file_path.unlink(missing_ok=True)
+            raise
+        
+        with self._index_lock:
+            self._index[document_id] = (file_path, safe_filename)
         
-        logger.info(f"Saved file: {file_path}")
+        logger.info(f"Saved file: {file_path} ({total_bytes} bytes)")
         
         return {
             "document_id": document_id,
@@ -42,90 +180,173 @@ class PDFService:
             "file_path": str(file_path)
         }
     
-    def extract_text_pypdf2(self, file_path: str) -> List[Dict[str, any]]:
+    def extract_text_pdfium(self, file_path: str) -> List[Dict[str, any]]:
         """
-        Extract text from PDF using PyPDF2.
+        Extract text from PDF using pypdfium2 (native PDFium, fastest).
         Returns list of pages with text and page numbers.
         """
-        pages_data = []
+        try:
+            pages_data = self._extract_pages("pdfium", file_path)
+            logger.info(f"Extracted {len(pages_data)} pages from {file_path} using pypdfium2")
+            return pages_data
         
+        except Exception as e:
+            logger.error(f"Error extracting with pypdfium2: {str(e)}")
+            raise
+    
+    def extract_text_pypdf(self, file_path: str) -> List[Dict[str, any]]:
+        """
+        Extract text from PDF using pypdf.
+        Returns list of pages with text and page numbers.
+        """
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                num_pages = len(pdf_reader.pages)
-                
-                for page_num in range(num_pages):
-                    page = pdf_reader.pages[page_num]
-                    text = page.extract_text()
-                    
-                    if text.strip():
-                        pages_data.append({
-                            "page_number": page_num + 1,
-                            "text": text
-                        })
-                
-                logger.info(f"Extracted {len(pages_data)} pages from {file_path} using PyPDF2")
-                return pages_data
+            pages_data = self._extract_pages("pypdf", file_path)
+            logger.info(f"Extracted {len(pages_data)} pages from {file_path} using pypdf")
+            return pages_data
         
         except Exception as e:
-            logger.error(f"Error extracting with PyPDF2: {str(e)}")
+            logger.error(f"Error extracting with pypdf: {str(e)}")
             raise
     
     def extract_text_pdfplumber(self, file_path: str) -> List[Dict[str, any]]:
         """
         Extract text from PDF using pdfplumber (more accurate for complex PDFs).
         """
-        pages_data = []
-        
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    
-                    if text and text.strip():
-                        pages_data.append({
-                            "page_number": page_num + 1,
-                            "text": text
-                        })
-                
-                logger.info(f"Extracted {len(pages_data)} pages from {file_path} using pdfplumber")
-                return pages_data
+            pages_data = self._extract_pages("pdfplumber", file_path)
+            logger.info(f"Extracted {len(pages_data)} pages from {file_path} using pdfplumber")
+            return pages_data
         
         except Exception as e:
             logger.error(f"Error extracting with pdfplumber: {str(e)}")
             raise
     
-    def extract_text(self, file_path: str, method: str = "pdfplumber") -> List[Dict[str, any]]:
+    def _extract_pages(self, method: str, file_path: str) -> List[Dict[str, any]]:
+        """Extract all pages into a list."""
+        return list(self._iter_pages(method, file_path))
+    
+    def _iter_pages(self, method: str, file_path: str) -> Iterator[Dict[str, any]]:
+        """
+        Yield pages in order, fanning page ranges out to the process pool.
+        All ranges are submitted up front, so workers keep extracting while
+        the caller processes earlier pages.
+        Small documents are extracted inline to skip the IPC overhead.
+        """
+        num_pages = _count_pages(method, file_path)
+        pages_per_task = max(
+            MIN_PAGES_PER_TASK,
+            -(-num_pages // (4 * self.max_workers))
+        )
+        
+        if num_pages <= pages_per_task:
+            yield from _extract_page_range(method, file_path, 0, num_pages)
+            return
+        
+        starts = list(range(0, num_pages, pages_per_task))
+        ends = [min(start + pages_per_task, num_pages) for start in starts]
+        
+        results = self._get_pool().map(
+            _extract_page_range,
+            repeat(method),
+            repeat(file_path),
+            starts,
+            ends
+        )
+        for page_range in results:
+            yield from page_range
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Lazily create the extraction pool, kept alive between requests."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    # spawn: forking a process that holds gRPC/torch threads is unsafe
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                    logger.info(f"PDF extraction pool started with {self.max_workers} workers")
+        return self._pool
+    
+    def shutdown(self):
+        """Stop the extraction pool if it was started."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    def extract_text(self, file_path: str, method: str = "pdfium") -> List[Dict[str, any]]:
         """
         Extract text using specified method with fallback.
+        pypdfium2 is the default; use "pdfplumber" when table layout matters.
         """
         try:
-            if method == "pdfplumber":
+            if method == "pdfium":
+                return self.extract_text_pdfium(file_path)
+            elif method == "pdfplumber":
                 return self.extract_text_pdfplumber(file_path)
             else:
-                return self.extract_text_pypdf2(file_path)
+                return self.extract_text_pypdf(file_path)
         except Exception as e:
             logger.warning(f"Primary extraction method failed, trying fallback: {str(e)}")
             # Try alternative method
-            if method == "pdfplumber":
-                return self.extract_text_pypdf2(file_path)
+            if method == "pdfium":
+                return self.extract_text_pdfplumber(file_path)
+            elif method == "pdfplumber":
+                return self.extract_text_pypdf(file_path)
             else:
                 return self.extract_text_pdfplumber(file_path)
     
+    def count_pages(self, file_path: str, method: str = "pdfium") -> int:
+        """Return the number of pages without extracting any text."""
+        try:
+            return _count_pages(method, file_path)
+        except Exception as e:
+            logger.warning(f"Could not count pages with {method}: {str(e)}")
+            return 0
+    
+    def iter_pages(self, file_path: str, method: str = "pdfium") -> Iterator[Dict[str, any]]:
+        """
+        Stream pages (same dicts as extract_text) as they are extracted.
+        Uses the same fallback order as extract_text; if the primary method
+        fails midway, the fallback resumes after the last page yielded.
+        """
+        fallback = {"pdfium": "pdfplumber", "pdfplumber": "pypdf"}.get(method, "pdfplumber")
+        last_page = 0
+        num_pages = 0
+        
+        try:
+            for page_data in self._iter_pages(method, file_path):
+                last_page = page_data["page_number"]
+                num_pages += 1
+                yield page_data
+        except Exception as e:
+            logger.warning(f"Primary extraction method failed, trying fallback: {str(e)}")
+            method = fallback
+            for page_data in self._iter_pages(method, file_path):
+                if page_data["page_number"] > last_page:
+                    num_pages += 1
+                    yield page_data
+        
+        logger.info(f"Extracted {num_pages} pages from {file_path} using {method}")
+    
     def delete_file(self, document_id: str) -> bool:
         """
         Delete PDF file by document ID.
         """
-        try:
-            # Find file with document_id prefix
-            for file_path in self.upload_dir.glob(f"{document_id}_*"):
-                file_path.unlink()
-                logger.info(f"Deleted file: {file_path}")
-                return True
-            
+        entry = self._lookup(document_id)
+        with self._index_lock:
+            self._index.pop(document_id, None)
+        
+        if entry is None:
             logger.warning(f"No file found for document_id: {document_id}")
             return False
         
+        file_path = entry[0]
+        try:
+            file_path.unlink()
+            logger.info(f"Deleted file: {file_path}")
+            return True
+        
         except Exception as e:
             logger.error(f"Error deleting file: {str(e)}")
             return False
@@ -134,22 +355,26 @@ class PDFService:
         """
         Get file path by document ID.
         """
-        for file_path in self.upload_dir.glob(f"{document_id}_*"):
-            return str(file_path)
-        return None
+        entry = self._lookup(document_id)
+        return str(entry[0]) if entry is not None else None
+    
+    def get_filename(self, document_id: str) -> Optional[str]:
+        """
+        Get the sanitized original filename by document ID.
+        """
+        entry = self._lookup(document_id)
+        return entry[1] if entry is not None else None
+    
+    # Translation table replacing unsafe filename characters with '_'
+    _UNSAFE_TABLE = str.maketrans({char: '_' for char in '<>:"/\\|?*'})
     
     @staticmethod
     def _sanitize_filename(filename: str) -> str:
         """
         Sanitize filename to prevent security issues.
         """
-        # Remove path components
-        filename = os.path.basename(filename)
-        # Remove or replace unsafe characters
-        unsafe_chars = '<>:"/\\|?*'
-        for char in unsafe_chars:
-            filename = filename.replace(char, '_')
-        return filename
+        # Remove path components, then replace unsafe characters in one pass
+        return os.path.basename(filename).translate(PDFService._UNSAFE_TABLE)
     
     def validate_pdf(self, file_path: str) -> bool:
         """
@@ -158,6 +383,12 @@ class PDFService:
         try:
             with open(file_path, 'rb') as f:
                 header = f.read(5)
-                return header == b'%PDF-'
+                return header == PDF_MAGIC
         except:
-            return False
\ No newline at end of file
+            return False
+
+
+@lru_cache(maxsize=1)
+def get_pdf_service() -> PDFService:
+    """Return the shared PDF service (owns the upload dir and extraction pool)."""
+    return PDFService(upload_dir=get_settings().UPLOAD_DIR)
@@ -1,15 +1,31 @@
-from typing import List, Dict, Any
-from app.services.pdf_service import PDFService
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterable, Iterator, Optional, Tuple
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from app.services.pdf_service import get_pdf_service
 from app.services.vector_service import VectorService
 from app.utils.chunker import TextChunker
 from app.utils.embeddings import EmbeddingGenerator
-from app.utils.llm_client import LLMClient
+from app.utils.llm_client import get_llm_client
+from app.utils.semantic_cache import SemanticCache
 from app.config import get_settings
+import asyncio
 import logging
+import threading
 import time
 
 logger = logging.getLogger(__name__)
 
+# Chunks embedded and inserted per step of the ingest pipeline
+INGEST_BATCH_SIZE = 32
+
+# Batches buffered between stages of the async ingest pipeline
+INGEST_CHUNK_QUEUE_SIZE = 4
+INGEST_EMBEDDING_QUEUE_SIZE = 2
+
+# Ingest progress callback: (stage, percent)
+ProgressCallback = Callable[[str, int], None]
+
 
 class RAGPipeline:
     """
@@ -19,20 +35,54 @@ class RAGPipeline:
     
     def __init__(self):
         self.settings = get_settings()
-        self.pdf_service = PDFService(upload_dir=self.settings.UPLOAD_DIR)
+        self.pdf_service = get_pdf_service()
         self.vector_service = VectorService()
         self.chunker = TextChunker(
             chunk_size=self.settings.CHUNK_SIZE,
             chunk_overlap=self.settings.CHUNK_OVERLAP
         )
         self.embedding_generator = EmbeddingGenerator()
-        self.llm_client = LLMClient()
+        self.llm_client = get_llm_client()
+        
+        # Answers for repeated / near-duplicate questions (None when disabled)
+        self.query_cache = SemanticCache(
+            dimension=self.settings.MILVUS_DIMENSION,
+            max_entries=self.settings.SEMANTIC_CACHE_MAX_ENTRIES
+        ) if self.settings.SEMANTIC_CACHE_ENABLED else None
+        
+        # Bumped on every ingest/delete so callers can cache document listings
+        self._docs_version = 0
+        self._docs_version_lock = threading.Lock()
+        
         logger.info("RAG Pipeline initialized successfully")
     
+    @property
+    def docs_version(self) -> int:
+        """Monotonic counter of document set changes."""
+        return self._docs_version
+    
+    def _bump_docs_version(self):
+        with self._docs_version_lock:
+            self._docs_version += 1
+        
+        # Cached answers may cite chunks that no longer exist
+        if self.query_cache is not None:
+            self.query_cache.clear()
+    
+    def _cached_result(self, cached: Dict[str, Any], question: str, start_time: float) -> Dict[str, Any]:
+        """Return a cached query result for the current question."""
+        logger.info(f"Query served from cache: {question}")
+        return {
+            **cached,
+            "question": question,
+            "processing_time": time.time() - start_time
+        }
+    
     def ingest_document(
         self,
         document_id: str,
-        filename: str
+        filename: str,
+        progress_callback: Optional[ProgressCallback] = None
     ) -> Dict[str, Any]:
         """
         Complete document ingestion pipeline.
@@ -43,8 +93,12 @@ class RAGPipeline:
         3. Chunk text
         4. Generate embeddings
         5. Store in vector database
+        
+        progress_callback, if given, is called with (stage, percent) as
+        pages are embedded ("extract", "embed", "index").
         """
         start_time = time.time()
+        report = progress_callback or (lambda stage, percent: None)
         
         try:
             # Step 1: Get file path
@@ -54,74 +108,355 @@ class RAGPipeline:
             
             logger.info(f"Starting ingestion for document: {document_id}")
             
-            # Step 2: Extract text from PDF
-            pages_data = self.pdf_service.extract_text(file_path)
+            # Page count drives progress; stages overlap, so percent follows
+            # the pages embedded so far (0-90), the final insert takes the rest
+            total_pages = self.pdf_service.count_pages(file_path) if progress_callback else 0
+            report("extract", 0)
             
-            if not pages_data:
-                raise ValueError("No text extracted from PDF")
+            # Steps 2-3: Stream pages out of the PDF and chunk each one as
+            # soon as it is extracted
+            pages_processed = 0
+            
+            def iter_pages() -> Iterator[Tuple[str, int]]:
+                nonlocal pages_processed
+                for page_data in self.pdf_service.iter_pages(file_path):
+                    pages_processed += 1
+                    yield page_data["text"], page_data["page_number"]
             
-            logger.info(f"Extracted {len(pages_data)} pages")
+            chunk_stream = self.chunker.iter_chunks(iter_pages())
             
-            # Step 3: Chunk text
-            all_chunks = []
-            all_page_numbers = []
+            # Steps 4-5: Generate embeddings per batch and store them in
+            # the vector database; each insert runs while the next batch embeds
+            logger.info("Generating and storing embeddings...")
+            embeddings_generated = 0
+            chunks_inserted = 0
+            timestamp = int(time.time())
             
-            for page_data in pages_data:
-                page_text = page_data["text"]
-                page_number = page_data["page_number"]
+            with ThreadPoolExecutor(max_workers=1) as insert_executor:
+                pending_insert: Optional[Future] = None
                 
-                # Chunk the page text
-                chunks_with_indices = self.chunker.chunk_text(page_text)
+                for start_index, chunks_batch, page_numbers_batch in self._iter_chunk_batches(
+                    chunk_stream
+                ):
+                    embeddings = self.embedding_generator.generate_embeddings_batch(
+                        chunks_batch,
+                        batch_size=INGEST_BATCH_SIZE
+                    )
+                    embeddings_generated += len(embeddings)
+                    if total_pages:
+                        report("embed", min(90, 90 * pages_processed // total_pages))
+                    
+                    # At most one insert in flight keeps memory at O(batch)
+                    if pending_insert is not None:
+                        chunks_inserted += pending_insert.result()
+                    pending_insert = insert_executor.submit(
+                        self.vector_service.insert_documents,
+                        document_id=document_id,
+                        filename=filename,
+                        chunks=chunks_batch,
+                        embeddings=embeddings,
+                        page_numbers=page_numbers_batch,
+                        start_index=start_index,
+                        timestamp=timestamp
+                    )
                 
-                for chunk_text, chunk_idx in chunks_with_indices:
-                    all_chunks.append(chunk_text)
-                    all_page_numbers.append(page_number)
+                if pending_insert is not None:
+                    report("index", 95)
+                    chunks_inserted += pending_insert.result()
             
-            if not all_chunks:
-                raise ValueError("No chunks created from document")
+            if not pages_processed:
+                raise ValueError("No text extracted from PDF")
             
-            logger.info(f"Created {len(all_chunks)} chunks")
+            if not embeddings_generated:
+                raise ValueError("No chunks created from document")
             
-            # Step 4: Generate embeddings
-            logger.info("Generating embeddings...")
-            embeddings = self.embedding_generator.generate_embeddings_batch(
-                all_chunks,
-                batch_size=32,
-                show_progress=True
+            return self._ingest_result(
+                document_id, filename, pages_processed,
+                embeddings_generated, chunks_inserted, start_time
             )
+        
+        except Exception as e:
+            logger.error(f"Error in document ingestion: {str(e)}")
+            raise
+        finally:
+            # Even a failed ingest may have written some chunks
+            self._bump_docs_version()
+    
+    async def ingest_document_async(
+        self,
+        document_id: str,
+        filename: str,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Same pipeline as ingest_document(), run as three concurrent stages
+        connected by bounded queues:
+        extract+chunk -> embed -> index.
+        Each stage runs its blocking work in a worker thread, so embedding
+        starts with the first chunk batch and Milvus inserts with the first
+        embedded batch, while the event loop stays free.
+        """
+        start_time = time.time()
+        report = progress_callback or (lambda stage, percent: None)
+        
+        try:
+            # Step 1: Get file path
+            file_path = self.pdf_service.get_file_path(document_id)
+            if not file_path:
+                raise ValueError(f"File not found for document_id: {document_id}")
             
-            logger.info(f"Generated {len(embeddings)} embeddings")
+            logger.info(f"Starting pipelined ingestion for document: {document_id}")
             
-            # Step 5: Store in vector database
-            chunks_inserted = self.vector_service.insert_documents(
-                document_id=document_id,
-                filename=filename,
-                chunks=all_chunks,
-                embeddings=embeddings,
-                page_numbers=all_page_numbers
-            )
+            total_pages = 0
+            if progress_callback:
+                total_pages = await asyncio.to_thread(self.pdf_service.count_pages, file_path)
+            report("extract", 0)
             
-            processing_time = time.time() - start_time
+            pages_processed = 0
+            embeddings_generated = 0
+            chunks_inserted = 0
+            timestamp = int(time.time())
             
-            result = {
-                "success": True,
-                "document_id": document_id,
-                "filename": filename,
-                "pages_processed": len(pages_data),
-                "chunks_created": len(all_chunks),
-                "embeddings_generated": len(embeddings),
-                "chunks_inserted": chunks_inserted,
-                "processing_time": processing_time
-            }
+            # None marks the end of each stream
+            chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=INGEST_CHUNK_QUEUE_SIZE)
+            embedding_queue: asyncio.Queue = asyncio.Queue(maxsize=INGEST_EMBEDDING_QUEUE_SIZE)
+            
+            def iter_pages() -> Iterator[Tuple[str, int]]:
+                nonlocal pages_processed
+                for page_data in self.pdf_service.iter_pages(file_path):
+                    pages_processed += 1
+                    yield page_data["text"], page_data["page_number"]
+            
+            async def extract_and_chunk():
+                # Steps 2-3: the page/chunk generator is advanced in a thread
+                batches = self._iter_chunk_batches(self.chunker.iter_chunks(iter_pages()))
+                while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+                    await chunk_queue.put(batch)
+                await chunk_queue.put(None)
+            
+            async def embed():
+                # Step 4
+                nonlocal embeddings_generated
+                while (batch := await chunk_queue.get()) is not None:
+                    start_index, chunks_batch, page_numbers_batch = batch
+                    embeddings = await asyncio.to_thread(
+                        self.embedding_generator.generate_embeddings_batch,
+                        chunks_batch,
+                        batch_size=INGEST_BATCH_SIZE
+                    )
+                    embeddings_generated += len(embeddings)
+                    if total_pages:
+                        report("embed", min(90, 90 * pages_processed // total_pages))
+                    await embedding_queue.put((start_index, chunks_batch, page_numbers_batch, embeddings))
+                report("index", 95)
+                await embedding_queue.put(None)
+            
+            async def index():
+                # Step 5
+                nonlocal chunks_inserted
+                while (item := await embedding_queue.get()) is not None:
+                    start_index, chunks_batch, page_numbers_batch, embeddings = item
+                    chunks_inserted += await asyncio.to_thread(
+                        self.vector_service.insert_documents,
+                        document_id=document_id,
+                        filename=filename,
+                        chunks=chunks_batch,
+                        embeddings=embeddings,
+                        page_numbers=page_numbers_batch,
+                        start_index=start_index,
+                        timestamp=timestamp
+                    )
+            
+            stages = [
+                asyncio.create_task(extract_and_chunk()),
+                asyncio.create_task(embed()),
+                asyncio.create_task(index())
+            ]
+            try:
+                await asyncio.gather(*stages)
+            except BaseException:
+                # A failed stage would leave the others blocked on its queue
+                for stage in stages:
+                    stage.cancel()
+                await asyncio.gather(*stages, return_exceptions=True)
+                raise
+            
+            if not pages_processed:
+                raise ValueError("No text extracted from PDF")
+            
+            if not embeddings_generated:
+                raise ValueError("No chunks created from document")
             
-            logger.info(f"Document ingestion completed in {processing_time:.2f}s")
-            return result
+            return self._ingest_result(
+                document_id, filename, pages_processed,
+                embeddings_generated, chunks_inserted, start_time
+            )
         
         except Exception as e:
             logger.error(f"Error in document ingestion: {str(e)}")
             raise
+        finally:
+            # Even a failed ingest may have written some chunks
+            self._bump_docs_version()
     
-    def query(
+    @staticmethod
+    def _ingest_result(
+        document_id: str,
+        filename: str,
+        pages_processed: int,
+        embeddings_generated: int,
+        chunks_inserted: int,
+        start_time: float
+    ) -> Dict[str, Any]:
+        """Build the ingestion result and log the summary."""
+        logger.info(f"Extracted {pages_processed} pages, embedded {embeddings_generated} chunks")
+        
+        processing_time = time.time() - start_time
+        
+        result = {
+            "success": True,
+            "document_id": document_id,
+            "filename": filename,
+            "pages_processed": pages_processed,
+            "chunks_created": embeddings_generated,
+            "embeddings_generated": embeddings_generated,
+            "chunks_inserted": chunks_inserted,
+            "processing_time": processing_time
+        }
+        
+        logger.info(f"Document ingestion completed in {processing_time:.2f}s")
+        return result
+    
+    @staticmethod
+    def _iter_chunk_batches(
+        chunk_stream: Iterable[Tuple[str, int]],
+        batch_size: int = None
+    ) -> Iterator[Tuple[int, List[str], List[int]]]:
+        """Group a (chunk, page_number) stream into (start_index, chunks, page_numbers) batches."""
+        batch_size = batch_size or INGEST_BATCH_SIZE
+        chunk_stream = iter(chunk_stream)
+        start = 0
+        
+        while batch := list(islice(chunk_stream, batch_size)):
+            chunks, page_numbers = zip(*batch)
+            yield start, list(chunks), list(page_numbers)
+            start += len(batch)
+    
+    async def _retrieve(
+        self,
+        question: str,
+        top_k: int,
+        start_time: float
+    ) -> Tuple[Optional[Dict[str, Any]], Any, List[Dict[str, Any]]]:
+        """
+        Steps 1-4 of the query pipeline, shared by query() and query_stream().
+        Returns (final_result, query_embedding, context_chunks); final_result
+        is set when no LLM call is needed (cache hit or nothing relevant).
+        """
+        cache = self.query_cache
+        
+        # Exact repeats skip the embedding entirely
+        if cache is not None:
+            cached = cache.get_exact(question, scope=top_k)
+            if cached is not None:
+                return self._cached_result(cached, question, start_time), None, []
+        
+        # Step 1: Generate query embedding
+        # (model inference and Milvus calls run off the event loop)
+        query_embedding = await asyncio.to_thread(
+            self.embedding_generator.generate_embedding,
+            question
+        )
+        
+        # Near-duplicate questions skip search and generation
+        if cache is not None:
+            cached = cache.get(
+                query_embedding,
+                threshold=self.settings.SEMANTIC_CACHE_THRESHOLD,
+                scope=top_k
+            )
+            if cached is not None:
+                return self._cached_result(cached, question, start_time), query_embedding, []
+        
+        # Step 2: Search vector database
+        search_results = await asyncio.to_thread(
+            self.vector_service.search,
+            query_embedding=query_embedding,
+            top_k=top_k
+        )
+        
+        if not search_results:
+            return {
+                "success": True,
+                "question": question,
+                "answer": "No se encontraron documentos relevantes para responder tu pregunta.",
+                "retrieved_chunks": [],
+                "processing_time": time.time() - start_time
+            }, query_embedding, []
+        
+        logger.info(f"Retrieved {len(search_results)} chunks")
+        
+        # Step 3: Filter by similarity threshold
+        filtered_results = [
+            result for result in search_results
+            if result["score"] >= self.settings.SIMILARITY_THRESHOLD
+        ]
+        
+        if not filtered_results:
+            return {
+                "success": True,
+                "question": question,
+                "answer": "Los documentos encontrados no son suficientemente relevantes para responder tu pregunta.",
+                "retrieved_chunks": [],
+                "processing_time": time.time() - start_time
+            }, query_embedding, []
+        
+        # Step 4: Prepare context for LLM
+        context_chunks = [
+            {
+                "chunk_id": result["id"],
+                "text": result["text"],
+                "score": result["score"],
+                "metadata": {
+                    "filename": result["filename"],
+                    "page_number": result["page_number"],
+                    "chunk_index": result["chunk_index"]
+                }
+            }
+            for result in filtered_results
+        ]
+        
+        return None, query_embedding, context_chunks
+    
+    def _finish_query(
+        self,
+        question: str,
+        top_k: int,
+        query_embedding: Any,
+        context_chunks: List[Dict[str, Any]],
+        answer: str,
+        start_time: float,
+        docs_version: int
+    ) -> Dict[str, Any]:
+        """Build the query result and cache it."""
+        processing_time = time.time() - start_time
+        
+        result = {
+            "success": True,
+            "question": question,
+            "answer": answer,
+            "retrieved_chunks": context_chunks,
+            "processing_time": processing_time
+        }
+        
+        # Skip caching if documents changed while the query ran
+        if self.query_cache is not None and docs_version == self._docs_version:
+            self.query_cache.set(query_embedding, result, question=question, scope=top_k)
+        
+        logger.info(f"Query completed in {processing_time:.2f}s")
+        return result
+    
+    async def query(
         self,
         question: str,
         top_k: int = None
@@ -141,92 +476,116 @@ class RAGPipeline:
         if top_k is None:
             top_k = self.settings.TOP_K_RESULTS
         
+        docs_version = self._docs_version
+        
         try:
             logger.info(f"Processing query: {question}")
             
-            # Step 1: Generate query embedding
-            query_embedding = self.embedding_generator.generate_embedding(question)
-            
-            # Step 2: Search vector database
-            search_results = self.vector_service.search(
-                query_embedding=query_embedding,
-                top_k=top_k
+            final_result, query_embedding, context_chunks = await self._retrieve(
+                question, top_k, start_time
             )
-            
-            if not search_results:
-                return {
-                    "success": True,
-                    "question": question,
-                    "answer": "No se encontraron documentos relevantes para responder tu pregunta.",
-                    "retrieved_chunks": [],
-                    "processing_time": time.time() - start_time
-                }
-            
-            logger.info(f"Retrieved {len(search_results)} chunks")
-            
-            # Step 3: Filter by similarity threshold
-            filtered_results = [
-                result for result in search_results
-                if result["score"] >= self.settings.SIMILARITY_THRESHOLD
-            ]
-            
-            if not filtered_results:
-                return {
-                    "success": True,
-                    "question": question,
-                    "answer": "Los documentos encontrados no son suficientemente relevantes para responder tu pregunta.",
-                    "retrieved_chunks": [],
-                    "processing_time": time.time() - start_time
-                }
-            
-            # Step 4: Prepare context for LLM
-            context_chunks = [
-                {
-                    "text": result["text"],
-                    "score": result["score"],
-                    "metadata": {
-                        "filename": result["filename"],
-                        "page_number": result["page_number"],
-                        "chunk_index": result["chunk_index"]
-                    }
-                }
-                for result in filtered_results
-            ]
+            if final_result is not None:
+                return final_result
             
             # Step 5: Generate answer
             logger.info("Generating answer with LLM...")
-            answer = self.llm_client.generate_answer(
+            answer = await self.llm_client.generate_answer(
                 question=question,
                 context_chunks=context_chunks
             )
             
-            processing_time = time.time() - start_time
+            return self._finish_query(
+                question, top_k, query_embedding, context_chunks,
+                answer, start_time, docs_version
+            )
+        
+        except Exception as e:
+            logger.error(f"Error in query pipeline: {str(e)}")
+            raise
+    
+    async def query_stream(
+        self,
+        question: str,
+        top_k: int = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of query().
+        Yields a "chunks" event with the retrieved chunks as soon as retrieval
+        finishes, then "delta" events with answer text as the LLM produces
+        it, then a final "done" event.
+        """
+        start_time = time.time()
+        
+        if top_k is None:
+            top_k = self.settings.TOP_K_RESULTS
+        
+        docs_version = self._docs_version
+        
+        try:
+            logger.info(f"Processing streaming query: {question}")
+            
+            final_result, query_embedding, context_chunks = await self._retrieve(
+                question, top_k, start_time
+            )
+            
+            if final_result is not None:
+                yield {"type": "chunks", "retrieved_chunks": final_result["retrieved_chunks"]}
+                yield {"type": "delta", "delta": final_result["answer"]}
+                yield {"type": "done", "processing_time": final_result["processing_time"]}
+                return
             
-            result = {
-                "success": True,
-                "question": question,
-                "answer": answer,
-                "retrieved_chunks": context_chunks,
-                "processing_time": processing_time
-            }
+            yield {"type": "chunks", "retrieved_chunks": context_chunks}
+            
+            # Step 5: Stream the answer
+            logger.info("Streaming answer from LLM...")
+            answer_parts = []
+            async for delta in self.llm_client.stream_answer(
+                question=question,
+                context_chunks=context_chunks
+            ):
+                answer_parts.append(delta)
+                yield {"type": "delta", "delta": delta}
             
-            logger.info(f"Query completed in {processing_time:.2f}s")
-            return result
+            result = self._finish_query(
+                question, top_k, query_embedding, context_chunks,
+                "".join(answer_parts).strip(), start_time, docs_version
+            )
+            yield {"type": "done", "processing_time": result["processing_time"]}
         
         except Exception as e:
-            logger.error(f"Error in query pipeline: {str(e)}")
+            logger.error(f"Error in streaming query pipeline: {str(e)}")
             raise
     
-    def delete_document(self, document_id: str) -> Dict[str, Any]:
+    def warmup(self):
+        """
+        Warm up the embedding model and the Milvus collection so the
+        first query after startup does not pay the loading cost.
+        """
+        start_time = time.time()
+        
+        try:
+            self.embedding_generator.generate_embedding("warmup")
+            self.vector_service.load_collection()
+            logger.info(f"Pipeline warmed up in {time.time() - start_time:.2f}s")
+        except Exception as e:
+            # A failed warmup only costs latency; queries can still run
+            logger.warning(f"Pipeline warmup failed: {str(e)}")
+    
+    def shutdown(self):
+        """Persist pending vector writes before the process exits."""
+        self.vector_service.flush()
+    
+    def delete_document(self, document_id: str, delete_file: bool = True) -> Dict[str, Any]:
         """
         Delete document from both filesystem and vector database.
+        With delete_file=False only the vectors are removed (used by reindex).
         """
         try:
             # Delete from vector database
             deleted_chunks = self.vector_service.delete_by_document_id(document_id)
             
             # Delete file
-            file_deleted = self.pdf_service.delete_file(document_id)
+            file_deleted = self.pdf_service.delete_file(document_id) if delete_file else False
             
             return {
                 "success": True,
@@ -238,6 +597,8 @@ class RAGPipeline:
         except Exception as e:
             logger.error(f"Error deleting document: {str(e)}")
             raise
+        finally:
+            self._bump_docs_version()
     
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """
@@ -258,4 +619,10 @@ class RAGPipeline:
             "total_chunks": stats.get("total_chunks", 0),
             "collection_name": stats.get("collection_name", ""),
             "embedding_dimension": self.embedding_generator.get_dimension()
-        }
\ No newline at end of file
+        }
+
+
+@lru_cache(maxsize=1)
+def get_rag_pipeline() -> RAGPipeline:
+    """Return the process-wide RAG pipeline (model, Milvus and LLM clients are loaded once)."""
+    return RAGPipeline()
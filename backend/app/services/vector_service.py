@@ -6,8 +6,10 @@ from pymilvus import (
     DataType,
     utility
 )
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 from app.config import get_settings
+from app.services.metadata_store import get_metadata_store
+import numpy as np
 import logging
 import time
 
@@ -25,6 +27,12 @@ class VectorService:
         self.collection_name = self.settings.MILVUS_COLLECTION
         self.dimension = self.settings.MILVUS_DIMENSION
         self.collection: Optional[Collection] = None
+        # Chunk texts are read from the side store, not from search results
+        self.metadata_store = get_metadata_store()
+        # Index type of the embedding field; search params depend on it
+        self.index_type = self.settings.MILVUS_INDEX_TYPE
+        # Embeddings are unit-norm, so inner product equals cosine similarity
+        self.metric_type = "IP"
         self._connect()
     
     def _connect(self):
@@ -47,7 +55,12 @@ class VectorService:
         if utility.has_collection(self.collection_name):
             logger.info(f"Collection '{self.collection_name}' exists, loading...")
             self.collection = Collection(self.collection_name)
+            index_params = self._get_index_params()
+            self.index_type = index_params.get("index_type", self.index_type)
+            # Collections created before the IP switch keep COSINE
+            self.metric_type = index_params.get("metric_type", self.metric_type)
             self.collection.load()
+            self._backfill_documents()
         else:
             logger.info(f"Creating new collection '{self.collection_name}'...")
             self._create_collection()
@@ -117,15 +130,9 @@ class VectorService:
         )
         
         # Create index for vector field
-        index_params = {
-            "metric_type": "COSINE",
-            "index_type": "IVF_FLAT",
-            "params": {"nlist": 128}
-        }
-        
         self.collection.create_index(
             field_name="embedding",
-            index_params=index_params
+            index_params=self._index_params()
         )
         
         # Load collection into memory
@@ -133,21 +140,89 @@ class VectorService:
         
         logger.info(f"Collection '{self.collection_name}' created and loaded successfully")
     
+    def _index_params(self) -> Dict[str, Any]:
+        """
+        Build index params for the configured index type.
+        IVF_SQ8 / IVF_PQ store quantized codes (4x / 16x smaller than fp32),
+        so each probe moves far fewer bytes than a raw-vector scan.
+        """
+        if self.index_type == "HNSW":
+            params = {
+                "M": self.settings.MILVUS_HNSW_M,
+                "efConstruction": self.settings.MILVUS_HNSW_EF_CONSTRUCTION
+            }
+        elif self.index_type == "IVF_SQ8":
+            params = {"nlist": self.settings.MILVUS_NLIST}
+        elif self.index_type == "IVF_PQ":
+            # One 8-bit code per 8 dimensions
+            params = {
+                "nlist": self.settings.MILVUS_NLIST,
+                "m": self.dimension // 8,
+                "nbits": 8
+            }
+        else:
+            raise ValueError(f"Unsupported Milvus index type: {self.index_type}")
+        
+        return {
+            "metric_type": self.metric_type,
+            "index_type": self.index_type,
+            "params": params
+        }
+    
+    def _get_index_params(self) -> Dict[str, Any]:
+        """Return the index params (index/metric type) of the embedding field."""
+        for index in self.collection.indexes:
+            if index.field_name == "embedding":
+                return index.params
+        return {}
+    
+    def _search_params(self, top_k: int) -> Dict[str, Any]:
+        """Build search params matching the collection's index type."""
+        if self.index_type == "HNSW":
+            # ef must be >= top_k; scale it so recall holds for larger k
+            params = {"ef": max(self.settings.MILVUS_HNSW_EF, top_k * 8)}
+        else:
+            # IVF_* indexes (including legacy IVF_FLAT collections)
+            params = {"nprobe": self.settings.MILVUS_NPROBE}
+        
+        return {
+            "metric_type": self.metric_type,
+            "params": params
+        }
+    
+    @staticmethod
+    def _document_expr(document_id: str) -> str:
+        """Filter expression matching one document (quotes escaped)."""
+        escaped = document_id.replace('\\', '\\\\').replace('"', '\\"')
+        return f'document_id == "{escaped}"'
+    
+    def load_collection(self):
+        """Load the collection and its index into Milvus memory."""
+        self.collection.load()
+        logger.info(f"Collection '{self.collection_name}' loaded")
+    
     def insert_documents(
         self,
         document_id: str,
         filename: str,
         chunks: List[str],
-        embeddings: List[List[float]],
-        page_numbers: Optional[List[int]] = None
+        embeddings: Union[np.ndarray, List[List[float]]],
+        page_numbers: Optional[List[int]] = None,
+        start_index: int = 0,
+        timestamp: Optional[int] = None
     ) -> int:
         """
         Insert document chunks with embeddings into Milvus.
+        Embeddings are passed as a 2D float32 array. The insert is not
+        flushed: new rows are searchable from growing segments, and
+        sealing is left to Milvus (or flush() on shutdown).
+        start_index/timestamp let a document be inserted in several batches.
         """
         if len(chunks) != len(embeddings):
             raise ValueError("Number of chunks must match number of embeddings")
         
-        timestamp = int(time.time())
+        if timestamp is None:
+            timestamp = int(time.time())
         
         if page_numbers is None:
             page_numbers = [0] * len(chunks)
@@ -156,16 +231,30 @@ class VectorService:
         data = [
             [document_id] * len(chunks),  # document_id
             [filename] * len(chunks),      # filename
-            list(range(len(chunks))),      # chunk_index
+            list(range(start_index, start_index + len(chunks))),  # chunk_index
             chunks,                         # chunk_text
-            embeddings,                     # embedding
+            np.asarray(embeddings, dtype=np.float32),  # embedding
             [timestamp] * len(chunks),     # upload_timestamp
             page_numbers                    # page_number
         ]
         
         try:
             result = self.collection.insert(data)
-            self.collection.flush()
+            try:
+                self.metadata_store.add_document_chunks(
+                    document_id,
+                    filename,
+                    timestamp,
+                    result.primary_keys,
+                    chunks
+                )
+            except Exception:
+                # Don't leave Milvus rows the side store knows nothing about
+                try:
+                    self.collection.delete(f"id in {list(result.primary_keys)}")
+                except Exception as e:
+                    logger.error(f"Error rolling back inserted chunks: {str(e)}")
+                raise
             logger.info(f"Inserted {len(chunks)} chunks for document {document_id}")
             return len(chunks)
         except Exception as e:
@@ -174,17 +263,14 @@ class VectorService:
     
     def search(
         self,
-        query_embedding: List[float],
+        query_embedding: Union[np.ndarray, List[float]],
         top_k: int = 5,
         filter_expr: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform vector similarity search.
         """
-        search_params = {
-            "metric_type": "COSINE",
-            "params": {"nprobe": 10}
-        }
+        search_params = self._search_params(top_k)
         
         try:
             results = self.collection.search(
@@ -193,78 +279,126 @@ class VectorService:
                 param=search_params,
                 limit=top_k,
                 expr=filter_expr,
+                # chunk_text is the largest field; it comes from the side store
                 output_fields=[
                     "document_id",
                     "filename",
                     "chunk_index",
-                    "chunk_text",
                     "page_number",
                     "upload_timestamp"
                 ]
             )
             
-            # Format results
-            formatted_results = []
-            for hits in results:
-                for hit in hits:
-                    formatted_results.append({
-                        "id": hit.id,
-                        "score": float(hit.score),
-                        "document_id": hit.entity.get("document_id"),
-                        "filename": hit.entity.get("filename"),
-                        "chunk_index": hit.entity.get("chunk_index"),
-                        "text": hit.entity.get("chunk_text"),
-                        "page_number": hit.entity.get("page_number"),
-                        "upload_timestamp": hit.entity.get("upload_timestamp")
-                    })
+            # Format results: a single query vector is always sent, so only
+            # results[0] exists; ids/distances come back as whole lists
+            hits = results[0]
+            formatted_results = [None] * len(hits)
+            for i, (hit_id, score, hit) in enumerate(zip(hits.ids, hits.distances, hits)):
+                entity = hit.entity
+                formatted_results[i] = {
+                    "id": hit_id,
+                    "score": float(score),
+                    "document_id": entity.get("document_id"),
+                    "filename": entity.get("filename"),
+                    "chunk_index": entity.get("chunk_index"),
+                    "text": None,
+                    "page_number": entity.get("page_number"),
+                    "upload_timestamp": entity.get("upload_timestamp")
+                }
             
+            self._attach_texts(formatted_results)
             return formatted_results
         
         except Exception as e:
             logger.error(f"Error searching vectors: {str(e)}")
             raise
     
+    def _attach_texts(self, results: List[Dict[str, Any]]):
+        """
+        Fill in chunk texts from the side store with one lookup.
+        Rows inserted before the store existed are read from Milvus once
+        and backfilled.
+        """
+        texts = self.metadata_store.get_texts([result["id"] for result in results])
+        
+        missing = [result for result in results if result["id"] not in texts]
+        if missing:
+            rows = self.collection.query(
+                expr=f'id in [{",".join(str(result["id"]) for result in missing)}]',
+                output_fields=["id", "document_id", "chunk_text"]
+            )
+            for row in rows:
+                texts[row["id"]] = row["chunk_text"]
+                self.metadata_store.put_chunks([row["id"]], row["document_id"], [row["chunk_text"]])
+        
+        for result in results:
+            result["text"] = texts.get(result["id"], "")
+    
     def delete_by_document_id(self, document_id: str) -> int:
         """
         Delete all chunks belonging to a document.
         """
         try:
-            expr = f'document_id == "{document_id}"'
+            expr = self._document_expr(document_id)
             
-            # Query to get IDs
-            results = self.collection.query(
+            # Count first: the delete result doesn't report matched rows
+            deleted_count = self.collection.query(
                 expr=expr,
-                output_fields=["id"]
-            )
+                output_fields=["count(*)"],
+                consistency_level="Strong"
+            )[0]["count(*)"]
             
-            if not results:
+            if not deleted_count:
                 logger.warning(f"No chunks found for document_id: {document_id}")
                 return 0
             
-            ids_to_delete = [str(result["id"]) for result in results]
-            
-            # Delete by IDs
-            delete_expr = f'id in [{",".join(ids_to_delete)}]'
-            self.collection.delete(delete_expr)
-            self.collection.flush()
+            # Delete by scalar field expression; no flush on the hot path
+            self.collection.delete(expr)
+            self.metadata_store.delete_document(document_id)
             
-            logger.info(f"Deleted {len(ids_to_delete)} chunks for document {document_id}")
-            return len(ids_to_delete)
+            logger.info(f"Deleted {deleted_count} chunks for document {document_id}")
+            return deleted_count
         
         except Exception as e:
             logger.error(f"Error deleting document: {str(e)}")
             raise
     
+    def _backfill_documents(self):
+        """
+        Build the documents table from Milvus once, for collections
+        populated before the table existed.
+        """
+        if self.metadata_store.has_documents():
+            return
+        
+        documents = self._scan_documents()
+        if documents:
+            self.metadata_store.put_documents(documents)
+            logger.info(f"Backfilled {len(documents)} documents into the metadata store")
+    
     def get_all_documents(self) -> List[Dict[str, Any]]:
         """
         Get list of all unique documents in the collection.
+        Served from the documents table kept in sync on insert/delete.
+        """
+        try:
+            return self.metadata_store.get_documents()
+        
+        except Exception as e:
+            logger.error(f"Error getting documents: {str(e)}")
+            raise
+    
+    def _scan_documents(self) -> List[Dict[str, Any]]:
+        """
+        Group chunks in Milvus by document (slow full scan, backfill only).
         """
         try:
             # Query all unique document_ids
             results = self.collection.query(
                 expr="document_id != ''",
                 output_fields=["document_id", "filename", "upload_timestamp"],
-                limit=10000
+                limit=10000,
+                consistency_level="Strong"
             )
             
             # Group by document_id
@@ -289,6 +423,8 @@ class VectorService:
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the collection."""
         try:
+            # Cheap approximate count (flushed segments, deletes not subtracted);
+            # a Strong count(*) would block health probes on every data node
             stats = self.collection.num_entities
             return {
                 "total_chunks": stats,
@@ -299,6 +435,15 @@ class VectorService:
             logger.error(f"Error getting stats: {str(e)}")
             raise
     
+    def flush(self):
+        """Seal pending inserts/deletes to persistent storage."""
+        try:
+            self.collection.flush()
+            logger.info(f"Collection '{self.collection_name}' flushed")
+        except Exception as e:
+            logger.error(f"Error flushing collection: {str(e)}")
+            raise
+    
     def health_check(self) -> bool:
         """Check if Milvus connection is healthy."""
         try:
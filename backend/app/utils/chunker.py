@@ -1,7 +1,113 @@
 import re
-from typing import List, Tuple
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 from app.config import get_settings
 
+# End marker for a sentence longer than chunk_size, split by words instead
+LONG_SENTENCE = -1
+
+
+def _pack_chunks(sizes: np.ndarray, chunk_size: int, overlap: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack sentences into overlapping chunks given their word counts.
+    Returns chunk boundaries as sentence ranges [start, end);
+    end == LONG_SENTENCE marks a single sentence to be split by words.
+    Scalar-only so it compiles under numba's nopython mode.
+    """
+    n = sizes.shape[0]
+    starts = np.empty(2 * n + 1, dtype=np.int64)
+    ends = np.empty(2 * n + 1, dtype=np.int64)
+    count = 0
+    
+    current_start = 0
+    current_size = 0
+    
+    for i in range(n):
+        sentence_size = sizes[i]
+        
+        # If single sentence exceeds chunk_size, split it
+        if sentence_size > chunk_size:
+            if current_start < i:
+                starts[count] = current_start
+                ends[count] = i
+                count += 1
+            
+            starts[count] = i
+            ends[count] = LONG_SENTENCE
+            count += 1
+            
+            current_start = i + 1
+            current_size = 0
+            continue
+        
+        # Check if adding sentence exceeds chunk_size
+        if current_size + sentence_size > chunk_size and current_start < i:
+            starts[count] = current_start
+            ends[count] = i
+            count += 1
+            
+            # Keep trailing sentences that fit in the overlap
+            overlap_size = 0
+            j = i
+            while j > current_start and overlap_size + sizes[j - 1] <= overlap:
+                j -= 1
+                overlap_size += sizes[j]
+            
+            current_start = j
+            current_size = overlap_size
+        
+        current_size += sentence_size
+    
+    # Add remaining chunk
+    if current_start < n:
+        starts[count] = current_start
+        ends[count] = n
+        count += 1
+    
+    return starts[:count], ends[:count]
+
+
+_pack_chunks_impl: Optional[Callable] = None
+
+
+class _CleanTable(dict):
+    """
+    str.translate table equivalent to deleting r'[^\w\s\.,;:!?()-]'.
+    Filled lazily per code point (a full Unicode table would be ~1.1M
+    entries); after warmup every lookup is a plain dict hit in C.
+    """
+    
+    _PUNCTUATION = frozenset(".,;:!?()-_")
+    
+    def __missing__(self, codepoint: int) -> Optional[int]:
+        char = chr(codepoint)
+        # \w is isalnum() plus '_', \s is isspace() for str patterns
+        if char.isalnum() or char.isspace() or char in self._PUNCTUATION:
+            value = codepoint
+        else:
+            value = None
+        self[codepoint] = value
+        return value
+
+
+_CLEAN_TABLE = _CleanTable()
+
+
+def _get_pack_chunks() -> Callable:
+    """
+    Return the numba-compiled _pack_chunks, compiling it on first use.
+    numba is imported lazily to keep it off the startup path; without it
+    the pure-Python version is used.
+    """
+    global _pack_chunks_impl
+    if _pack_chunks_impl is None:
+        try:
+            from numba import njit
+            _pack_chunks_impl = njit(cache=True)(_pack_chunks)
+        except ImportError:
+            _pack_chunks_impl = _pack_chunks
+    return _pack_chunks_impl
+
 
 class TextChunker:
     """
@@ -12,13 +118,18 @@ class TextChunker:
         settings = get_settings()
         self.chunk_size = chunk_size or settings.CHUNK_SIZE
         self.chunk_overlap = chunk_overlap or settings.CHUNK_OVERLAP
+        self.min_chunk_size = 20  # minimum words
+        
+        # Compiled once; clean_text/chunk_by_sentences run for every page
+        self._ws_re = re.compile(r'\s+')
+        self._sent_re = re.compile(r'(?<=[.!?])\s+')
     
     def clean_text(self, text: str) -> str:
         """Clean and normalize text."""
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = self._ws_re.sub(' ', text)
         # Remove special characters but keep punctuation
-        text = re.sub(r'[^\w\s\.,;:!?()-]', '', text)
+        text = text.translate(_CLEAN_TABLE)
         # Strip leading/trailing whitespace
         text = text.strip()
         return text
@@ -28,53 +139,25 @@ class TextChunker:
         Split text into chunks based on sentences with overlap.
         """
         # Split into sentences
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        sentences = self._sent_re.split(text)
+        sizes = np.fromiter(
+            (len(sentence.split()) for sentence in sentences),
+            dtype=np.int32,
+            count=len(sentences)
+        )
         
-        chunks = []
-        current_chunk = []
-        current_size = 0
+        # Chunk boundaries are computed natively; strings are joined here
+        starts, ends = _get_pack_chunks()(sizes, self.chunk_size, self.chunk_overlap)
         
-        for sentence in sentences:
-            sentence_size = len(sentence.split())
-            
-            # If single sentence exceeds chunk_size, split it
-            if sentence_size > self.chunk_size:
-                if current_chunk:
-                    chunks.append(' '.join(current_chunk))
-                    current_chunk = []
-                    current_size = 0
-                
+        chunks = []
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            if end == LONG_SENTENCE:
                 # Split long sentence into smaller parts
-                words = sentence.split()
+                words = sentences[start].split()
                 for i in range(0, len(words), self.chunk_size):
-                    chunk_words = words[i:i + self.chunk_size]
-                    chunks.append(' '.join(chunk_words))
-                continue
-            
-            # Check if adding sentence exceeds chunk_size
-            if current_size + sentence_size > self.chunk_size and current_chunk:
-                chunks.append(' '.join(current_chunk))
-                
-                # Calculate overlap
-                overlap_size = 0
-                overlap_sentences = []
-                for s in reversed(current_chunk):
-                    s_size = len(s.split())
-                    if overlap_size + s_size <= self.chunk_overlap:
-                        overlap_sentences.insert(0, s)
-                        overlap_size += s_size
-                    else:
-                        break
-                
-                current_chunk = overlap_sentences
-                current_size = overlap_size
-            
-            current_chunk.append(sentence)
-            current_size += sentence_size
-        
-        # Add remaining chunk
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+                    chunks.append(' '.join(words[i:i + self.chunk_size]))
+            else:
+                chunks.append(' '.join(sentences[start:end]))
         
         return chunks
     
@@ -86,11 +169,25 @@ class TextChunker:
         chunks = self.chunk_by_sentences(cleaned_text)
         
         # Filter out very small chunks
-        min_chunk_size = 20  # minimum words
+        min_chunk_size = self.min_chunk_size
         filtered_chunks = [
             (chunk, idx) 
             for idx, chunk in enumerate(chunks) 
             if len(chunk.split()) >= min_chunk_size
         ]
         
-        return filtered_chunks
\ No newline at end of file
+        return filtered_chunks
+    
+    def iter_chunks(self, pages: Iterable[Tuple[str, int]]) -> Iterator[Tuple[str, int]]:
+        """
+        Lazily chunk a stream of (text, page_number) pages.
+        Yields (chunk, page_number) as each page is processed.
+        """
+        clean_text = self.clean_text
+        chunk_by_sentences = self.chunk_by_sentences
+        min_chunk_size = self.min_chunk_size
+        
+        for text, page_number in pages:
+            for chunk in chunk_by_sentences(clean_text(text)):
+                if len(chunk.split()) >= min_chunk_size:
+                    yield chunk, page_number
@@ -1,12 +1,83 @@
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from typing import List, Union
+import torch
+from typing import List, Optional, Union
 from app.config import get_settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+class ONNXEncoder:
+    """
+    Sentence encoder running an ONNX Runtime export of the model.
+    Reproduces the sentence-transformers pipeline (mean pooling +
+    L2 normalization) behind the same encode() interface.
+    """
+    
+    def __init__(
+        self,
+        model_name: str,
+        device: str = "cpu",
+        onnx_path: Optional[str] = None,
+        max_seq_length: int = 256
+    ):
+        # Optional dependency, only needed for EMBEDDING_BACKEND=onnx
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+        
+        provider = "CUDAExecutionProvider" if device.startswith("cuda") else "CPUExecutionProvider"
+        self.max_seq_length = max_seq_length
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_path or model_name)
+        
+        if onnx_path:
+            # Pre-exported, e.g. `optimum-cli export onnx --model <name> --optimize O2 <path>`
+            self.model = ORTModelForFeatureExtraction.from_pretrained(onnx_path, provider=provider)
+        else:
+            self.model = ORTModelForFeatureExtraction.from_pretrained(
+                model_name,
+                export=True,
+                provider=provider
+            )
+    
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = True
+    ) -> np.ndarray:
+        """Encode one text or a list of texts into (always) normalized embeddings."""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        
+        # Batch texts of similar length together to minimize padding
+        order = sorted(range(len(sentences)), key=lambda i: -len(sentences[i]))
+        embeddings = np.empty((len(sentences), self.model.config.hidden_size), dtype=np.float32)
+        
+        for start in range(0, len(order), batch_size):
+            batch_ids = order[start:start + batch_size]
+            inputs = self.tokenizer(
+                [sentences[i] for i in batch_ids],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            token_embeddings = self.model(**inputs).last_hidden_state
+            
+            # Mean pooling over non-padding tokens
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            embeddings[batch_ids] = pooled / np.clip(norms, 1e-12, None)
+        
+        return embeddings[0] if single else embeddings
+
+
 class EmbeddingGenerator:
     """
     Generate embeddings using sentence-transformers.
@@ -19,32 +90,62 @@ class EmbeddingGenerator:
         self.device = settings.EMBEDDING_DEVICE
         self.dimension = settings.MILVUS_DIMENSION
         
-        logger.info(f"Loading embedding model: {self.model_name}")
-        self.model = SentenceTransformer(self.model_name, device=self.device)
+        logger.info(f"Loading embedding model: {self.model_name} ({settings.EMBEDDING_BACKEND})")
+        if settings.EMBEDDING_BACKEND == "onnx":
+            self.model = ONNXEncoder(
+                self.model_name,
+                device=self.device,
+                onnx_path=settings.EMBEDDING_ONNX_PATH or None
+            )
+        else:
+            self.model = SentenceTransformer(self.model_name, device=self.device)
+            
+            if settings.EMBEDDING_QUANTIZE:
+                self._quantize()
+        
         logger.info(f"Model loaded successfully on {self.device}")
     
-    def generate_embedding(self, text: str) -> List[float]:
-        """Generate embedding for a single text."""
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+    def _quantize(self):
+        """
+        Reduce model precision: fp16 weights on GPU, dynamic int8 Linear
+        layers on CPU. Outputs are cast back to fp32 for Milvus.
+        """
+        if self.device.startswith("cuda"):
+            self.model = self.model.half()
+            logger.info("Embedding model converted to fp16")
+        else:
+            self.model = torch.quantization.quantize_dynamic(
+                self.model,
+                {torch.nn.Linear},
+                dtype=torch.qint8
+            )
+            logger.info("Embedding model quantized to int8")
+    
+    def generate_embedding(self, text: str) -> np.ndarray:
+        """Generate embedding for a single text (float32 unit vector of shape (dim,))."""
+        embedding = self.model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
+        return embedding.astype(np.float32, copy=False)
     
     def generate_embeddings_batch(
         self, 
         texts: List[str], 
         batch_size: int = 32,
         show_progress: bool = False
-    ) -> List[List[float]]:
+    ) -> np.ndarray:
         """
         Generate embeddings for multiple texts in batches.
         More efficient for large document processing.
+        Returns a (len(texts), dim) float32 array of unit vectors, passed
+        as-is to Milvus.
         """
         embeddings = self.model.encode(
             texts,
             batch_size=batch_size,
             show_progress_bar=show_progress,
-            convert_to_numpy=True
+            convert_to_numpy=True,
+            normalize_embeddings=True
         )
-        return embeddings.tolist()
+        return embeddings.astype(np.float32, copy=False)
     
     def get_dimension(self) -> int:
         """Return the dimension of embeddings."""
@@ -66,4 +167,21 @@ class EmbeddingGenerator:
         norm2 = np.linalg.norm(embedding2)
         
         similarity = dot_product / (norm1 * norm2)
-        return float(similarity)
\ No newline at end of file
+        return float(similarity)
+    
+    def compute_similarity_batch(
+        self,
+        query: Union[List[float], np.ndarray],
+        corpus: Union[List[List[float]], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Cosine similarity of one query against many embeddings.
+        Rows are normalized once and scored with a single matrix-vector product.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        corpus = np.asarray(corpus, dtype=np.float32)
+        
+        query_norm = query / max(np.linalg.norm(query), 1e-12)
+        corpus_norm = corpus / np.clip(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12, None)
+        
+        return corpus_norm @ query_norm
\ No newline at end of file
@@ -0,0 +1,109 @@
+from typing import Any, Dict, List, Optional, Protocol
+from cachetools import TTLCache
+from threading import Lock
+import hashlib
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(Protocol):
+    """Async key-value store used by LLMCache."""
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+    
+    async def set(self, key: str, value: Dict[str, Any], ttl_seconds: int):
+        ...
+    
+    async def delete(self, key: str):
+        ...
+
+
+class InMemoryBackend:
+    """Process-local backend (bounded, entries expire after the TTL)."""
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 3600):
+        self._cache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self._lock = Lock()
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._cache.get(key)
+    
+    async def set(self, key: str, value: Dict[str, Any], ttl_seconds: int):
+        # TTL is fixed per cache instance
+        with self._lock:
+            self._cache[key] = value
+    
+    async def delete(self, key: str):
+        with self._lock:
+            self._cache.pop(key, None)
+
+
+class RedisBackend:
+    """Redis backend, shared across workers and restarts."""
+    
+    def __init__(self, url: str, prefix: str = "llm:"):
+        # Optional dependency, only needed for LLM_CACHE_BACKEND=redis
+        import redis.asyncio as redis
+        
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+    
+    async def set(self, key: str, value: Dict[str, Any], ttl_seconds: int):
+        await self._redis.set(self._prefix + key, json.dumps(value), ex=ttl_seconds)
+    
+    async def delete(self, key: str):
+        await self._redis.delete(self._prefix + key)
+    
+    async def close(self):
+        await self._redis.close()
+
+
+class LLMCache:
+    """
+    Completion cache keyed by model, temperature, question and the ids of
+    the retrieved chunks. Backend errors are logged and treated as misses,
+    so a cache outage never fails a query.
+    """
+    
+    def __init__(self, backend: CacheBackend, ttl_seconds: int = 3600):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+    
+    @staticmethod
+    def make_key(model: str, temperature: float, question: str, chunk_ids: List[Any]) -> str:
+        payload = json.dumps(
+            {
+                "model": model,
+                "q": question,
+                "chunks": sorted(chunk_ids),
+                "t": temperature
+            },
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"LLM cache get failed: {str(e)}")
+            return None
+    
+    async def set(self, key: str, value: Dict[str, Any]):
+        try:
+            await self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"LLM cache set failed: {str(e)}")
+    
+    async def close(self):
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            await close()
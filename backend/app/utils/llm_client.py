@@ -1,11 +1,136 @@
-from openai import OpenAI
-import google.generativeai as genai
-from typing import List, Dict
+from tenacity import (
+    before_sleep_log,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter
+)
+from contextlib import nullcontext
+from functools import lru_cache
+from types import MappingProxyType
+from typing import TYPE_CHECKING, AsyncIterator, List, Dict, Optional, Tuple
 from app.config import get_settings
+from app.utils.llm_cache import InMemoryBackend, LLMCache, RedisBackend
+import asyncio
+import hashlib
+import httpx
+import json
 import logging
+import sys
+
+if TYPE_CHECKING:
+    import tiktoken
 
 logger = logging.getLogger(__name__)
 
+# Pooled keep-alive connections shared by all concurrent LLM requests
+_HTTP_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+_HTTP_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# Transient provider errors (rate limits, timeouts, 5xx) are retried with
+# exponential backoff + jitter; anything else fails immediately
+def _is_retryable(error: BaseException) -> bool:
+    """
+    Check an error against the transient error types of each provider SDK.
+    The SDKs are imported lazily, so only the ones already loaded are
+    checked (an SDK error implies its SDK is loaded).
+    """
+    openai = sys.modules.get("openai")
+    if openai is not None and isinstance(
+        error,
+        (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+    ):
+        return True
+    
+    google_exceptions = sys.modules.get("google.api_core.exceptions")
+    if google_exceptions is not None and isinstance(
+        error,
+        (google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable)
+    ):
+        return True
+    
+    return False
+
+
+_llm_retry = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception(_is_retryable),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True
+)
+
+# OpenAI Batch API polling
+_BATCH_POLL_INTERVAL = 10.0  # seconds
+_BATCH_FINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# Static role + instructions sent as the system message; identical on every
+# call so it forms the cacheable prompt prefix
+STATIC_SYSTEM = """Eres un asistente experto en responder preguntas basándose en documentos institucionales. Respondes basándote únicamente en la información proporcionada.
+
+INSTRUCCIONES:
+1. Responde la pregunta usando ÚNICAMENTE la información del contexto proporcionado
+2. Si la información no está en el contexto, indica claramente que no puedes responder con la información disponible
+3. Sé preciso, claro y conciso
+4. Cita el número de fragmento cuando sea relevante
+5. Si hay información contradictoria, menciónalo"""
+
+# Fixed pieces of the user prompt
+_CONTEXT_PREFIX = "CONTEXTO RECUPERADO:\n"
+_QUESTION_PREFIX = "\n\nPREGUNTA DEL USUARIO:\n"
+_ANSWER_SUFFIX = "\n\nRESPUESTA:"
+
+# Precomputed fragment labels, with the separator from the previous fragment
+_MAX_FRAGMENTS = 256
+_FRAG_PREFIXES = [f"[Fragmento {i+1}]:\n" for i in range(_MAX_FRAGMENTS)]
+_FRAG_SEP_PREFIXES = [f"\n\n{prefix}" for prefix in _FRAG_PREFIXES]
+
+# Context window (prompt + completion tokens) used when LLM_CONTEXT_WINDOW is 0
+_DEFAULT_CONTEXT_WINDOWS = MappingProxyType({
+    "openai": 16385,  # gpt-3.5-turbo
+    "gemini": 30720,  # gemini-pro input limit
+})
+
+# Slack for tokenizer mismatch and chat formatting overhead
+_PROMPT_SAFETY_MARGIN = 256
+
+# Token estimate when tiktoken can't load its encoding (e.g. offline, where
+# the BPE file can't be downloaded); deliberately overcounts Spanish text
+_CHARS_PER_TOKEN_ESTIMATE = 3
+
+# Mapeo de nombres de modelo de Gemini
+_GEMINI_MODEL_MAPPING = MappingProxyType({
+    # Recommended modern models (use the short ID or the models/ prefix)
+    "gemini-2.5-flash": "models/gemini-2.5-flash", 
+    "gemini-2.5-pro": "models/gemini-2.5-pro",
+    "gemini-flash": "models/gemini-2.5-flash", # Common alias
+    # Legacy/older models may require specific version numbers if available
+    # "gemini-pro" is deprecated; consider using a modern equivalent
+})
+
+# Used only if the configured model turns out not to exist
+_GEMINI_FALLBACK_MODEL = "models/gemini-pro"
+
+# Ajustes de seguridad de Gemini (más permisivos para documentos técnicos)
+_GEMINI_SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_ONLY_HIGH"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_ONLY_HIGH"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_ONLY_HIGH"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_ONLY_HIGH"
+    },
+]
+
 
 class LLMClient:
     """
@@ -19,11 +144,35 @@ class LLMClient:
         self.max_tokens = settings.LLM_MAX_TOKENS
         self.temperature = settings.LLM_TEMPERATURE
         
+        # Bounds in-flight provider requests so bursts stay under the RPM
+        # limit instead of triggering a retry storm
+        self._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        
+        # Per-call request parameters, built once (none depend on the query)
+        self._openai_system_message = {"role": "system", "content": STATIC_SYSTEM}
+        self._gemini_generation_config = {
+            "temperature": self.temperature,
+            "max_output_tokens": self.max_tokens,
+            "top_p": 0.95,
+        }
+        self._gemini_completion_config = {
+            "temperature": self.temperature,
+            "max_output_tokens": self.max_tokens,
+        }
+        
         if self.provider == "openai":
             api_key = settings.OPENAI_API_KEY
             if not api_key:
                 raise ValueError("OPENAI_API_KEY not set in environment")
-            self.client = OpenAI(api_key=api_key)
+            
+            # Provider SDKs are imported only for the provider in use
+            from openai import AsyncOpenAI
+            
+            self.client = AsyncOpenAI(
+                api_key=api_key,
+                http_client=httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_HTTP_TIMEOUT),
+                max_retries=0  # retried by _llm_retry instead
+            )
             self.model = settings.OPENAI_MODEL
             logger.info(f"OpenAI client initialized with model: {self.model}")
         
@@ -32,25 +181,17 @@ class LLMClient:
             if not api_key:
                 raise ValueError("GEMINI_API_KEY not set in environment")
             
+            import google.generativeai as genai
+            
             # Configurar Gemini con la API key
             genai.configure(api_key=api_key)
             
             # CORREGIDO: Usar nombres de modelo correctos
             model_name = settings.GEMINI_MODEL
             
-            # Mapeo de nombres de modelo
-            model_mapping = {
-                # Recommended modern models (use the short ID or the models/ prefix)
-                "gemini-2.5-flash": "models/gemini-2.5-flash", 
-                "gemini-2.5-pro": "models/gemini-2.5-pro",
-                "gemini-flash": "models/gemini-2.5-flash", # Common alias
-                # Legacy/older models may require specific version numbers if available
-                # "gemini-pro" is deprecated; consider using a modern equivalent
-            }
-            
             # Si el usuario especificó un nombre corto, usar el mapeo
-            if model_name in model_mapping:
-                full_model_name = model_mapping[model_name]
+            if model_name in _GEMINI_MODEL_MAPPING:
+                full_model_name = _GEMINI_MODEL_MAPPING[model_name]
             elif not model_name.startswith("models/"):
                 # Si no tiene el prefijo, agregarlo
                 full_model_name = f"models/{model_name}"
@@ -59,115 +200,229 @@ class LLMClient:
             
             self.model = full_model_name
             
+            # Built on first use (see gemini_model)
+            self._gemini_model = None
+            logger.info(f"Gemini client configured with model: {self.model}")
+        
+        else:
+            raise ValueError(f"Unsupported LLM provider: {self.provider}")
+        
+        self.cache = self._init_cache(settings)
+        
+        # Token budget for the retrieved context
+        self._encoding = self._init_encoding()
+        context_window = settings.LLM_CONTEXT_WINDOW or _DEFAULT_CONTEXT_WINDOWS[self.provider]
+        self._context_budget = context_window - self.max_tokens - _PROMPT_SAFETY_MARGIN
+        self._context_budget -= self._count_tokens(
+            STATIC_SYSTEM + _CONTEXT_PREFIX + _QUESTION_PREFIX + _ANSWER_SUFFIX
+        )
+    
+    @property
+    def gemini_model(self):
+        """Gemini model handle, created on first use."""
+        if self._gemini_model is None:
+            import google.generativeai as genai
+            
+            self._gemini_model = genai.GenerativeModel(self.model)
+            logger.info(f"Gemini client initialized with model: {self.model}")
+        return self._gemini_model
+    
+    @_llm_retry
+    async def _openai_create(self, acquire: bool = True, **kwargs):
+        """
+        Call chat.completions.create with the client's model settings.
+        acquire=False when the caller already holds the semaphore (streams).
+        """
+        async with self._semaphore if acquire else nullcontext():
+            return await self.client.chat.completions.create(
+                model=self.model,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                **kwargs
+            )
+    
+    @_llm_retry
+    async def _gemini_generate(self, prompt: str, acquire: bool = True, **kwargs):
+        """
+        Call generate_content_async, switching to the fallback model once
+        if the configured one doesn't exist.
+        acquire=False when the caller already holds the semaphore (streams).
+        """
+        from google.api_core import exceptions as google_exceptions
+        
+        async with self._semaphore if acquire else nullcontext():
             try:
-                self.gemini_model = genai.GenerativeModel(self.model)
-                logger.info(f"Gemini client initialized with model: {self.model}")
-            except Exception as e:
-                logger.error(f"Error initializing Gemini model: {str(e)}")
+                return await self.gemini_model.generate_content_async(prompt, **kwargs)
+            except google_exceptions.NotFound as e:
+                if self.model == _GEMINI_FALLBACK_MODEL:
+                    raise
+                logger.error(f"Error with Gemini model {self.model}: {str(e)}")
                 logger.info("Trying with gemini-pro as fallback...")
-                self.model = "models/gemini-pro"
-                self.gemini_model = genai.GenerativeModel(self.model)
-                logger.info(f"Gemini client initialized with fallback model: {self.model}")
+                self.model = _GEMINI_FALLBACK_MODEL
+                self._gemini_model = None
+                return await self.gemini_model.generate_content_async(prompt, **kwargs)
+    
+    def _openai_messages(self, system_prompt: str, user_prompt: str) -> List[Dict[str, str]]:
+        """Chat messages for a RAG prompt, reusing the prebuilt system message."""
+        if system_prompt is STATIC_SYSTEM:
+            system_message = self._openai_system_message
+        else:
+            system_message = {"role": "system", "content": system_prompt}
+        return [system_message, {"role": "user", "content": user_prompt}]
+    
+    def _init_encoding(self) -> Optional["tiktoken.Encoding"]:
+        """
+        Tokenizer used for the context budget. Gemini has no local
+        tokenizer (count_tokens is a network call), so cl100k_base is used
+        as an approximation there; the safety margin absorbs the difference.
+        None means tokens are estimated from the character count.
+        """
+        try:
+            import tiktoken
+            
+            if self.provider == "openai":
+                try:
+                    return tiktoken.encoding_for_model(self.model)
+                except KeyError:
+                    pass
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.error(
+                f"Tokenizer unavailable, estimating context tokens from characters "
+                f"(bundle it via TIKTOKEN_CACHE_DIR): {str(e)}"
+            )
+            return None
+    
+    def _count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            return len(text) // _CHARS_PER_TOKEN_ESTIMATE + 1
+        return len(self._encoding.encode(text, disallowed_special=()))
+    
+    def _fit_context(
+        self,
+        question: str,
+        context_chunks: List[Dict[str, any]]
+    ) -> List[Dict[str, any]]:
+        """
+        Keep the highest-scoring chunks that fit in the context budget, so
+        the prompt never overflows the model's context window.
+        """
+        budget = self._context_budget - self._count_tokens(question)
+        kept = []
+        used = 0
+        for chunk in sorted(context_chunks, key=lambda chunk: chunk.get('score', 0.0), reverse=True):
+            # + fragment header ("\n\n[Fragmento N]:\n")
+            tokens = self._count_tokens(chunk['text']) + 8
+            if used + tokens > budget:
+                break
+            kept.append(chunk)
+            used += tokens
         
+        if len(kept) < len(context_chunks):
+            logger.warning(
+                f"Dropped {len(context_chunks) - len(kept)} of {len(context_chunks)} chunks "
+                f"to fit the context budget ({budget} tokens)"
+            )
+        return kept
+    
+    @staticmethod
+    def _init_cache(settings) -> Optional[LLMCache]:
+        """Create the completion cache for the configured backend, if any."""
+        if settings.LLM_CACHE_BACKEND == "redis":
+            backend = RedisBackend(settings.REDIS_URL)
+        elif settings.LLM_CACHE_BACKEND == "memory":
+            backend = InMemoryBackend(
+                max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.LLM_CACHE_TTL
+            )
         else:
-            raise ValueError(f"Unsupported LLM provider: {self.provider}")
+            return None
+        
+        logger.info(f"LLM cache enabled ({settings.LLM_CACHE_BACKEND})")
+        return LLMCache(backend, ttl_seconds=settings.LLM_CACHE_TTL)
     
     def build_rag_prompt(
         self, 
         question: str, 
         context_chunks: List[Dict[str, any]]
-    ) -> str:
+    ) -> Tuple[str, str]:
         """
-        Build a prompt for RAG with retrieved context.
+        Build the (system_prompt, user_prompt) pair for RAG.
+        All instructions live in the static system prompt; the user prompt
+        holds the retrieved context and the question. Chunks are ordered by
+        a stable hash of their text (not by score), so the same chunk set
+        always yields the same prompt and can hit the provider's prompt cache.
+        Chunks that don't fit the token budget are dropped first, lowest
+        score first.
         """
-        context_text = "\n\n".join([
-            f"[Fragmento {i+1}]:\n{chunk['text']}"
-            for i, chunk in enumerate(context_chunks)
-        ])
+        ordered_chunks = sorted(
+            self._fit_context(question, context_chunks),
+            key=lambda chunk: hashlib.sha1(chunk['text'].encode('utf-8')).digest()
+        )
         
-        prompt = f"""Eres un asistente experto que responde preguntas basándose únicamente en la información proporcionada.
-
-CONTEXTO RECUPERADO:
-{context_text}
-
-PREGUNTA DEL USUARIO:
-{question}
-
-INSTRUCCIONES:
-1. Responde la pregunta usando ÚNICAMENTE la información del contexto proporcionado
-2. Si la información no está en el contexto, indica claramente que no puedes responder con la información disponible
-3. Sé preciso, claro y conciso
-4. Cita el número de fragmento cuando sea relevante
-5. Si hay información contradictoria, menciónalo
-
-RESPUESTA:"""
+        # Single join over all parts; no per-fragment formatting
+        parts = [_CONTEXT_PREFIX]
+        for i, chunk in enumerate(ordered_chunks):
+            if i < _MAX_FRAGMENTS:
+                parts.append(_FRAG_SEP_PREFIXES[i] if i else _FRAG_PREFIXES[0])
+            else:
+                parts.append(f"\n\n[Fragmento {i+1}]:\n")
+            parts.append(chunk['text'])
+        parts.append(_QUESTION_PREFIX)
+        parts.append(question)
+        parts.append(_ANSWER_SUFFIX)
         
-        return prompt
+        return STATIC_SYSTEM, "".join(parts)
     
-    def generate_answer(
+    async def generate_answer(
         self, 
         question: str, 
         context_chunks: List[Dict[str, any]]
     ) -> str:
         """
         Generate an answer using the LLM with retrieved context.
+        Awaits the provider's async API, so the event loop stays free.
+        Deterministic (temperature 0) answers are cached per question and
+        retrieved chunk set.
         """
-        prompt = self.build_rag_prompt(question, context_chunks)
+        cache_key = None
+        if self.cache is not None and self.temperature == 0:
+            cache_key = LLMCache.make_key(
+                self.model,
+                self.temperature,
+                question,
+                [chunk.get("chunk_id") for chunk in context_chunks]
+            )
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("LLM answer served from cache")
+                return cached["answer"]
+        
+        system_prompt, user_prompt = self.build_rag_prompt(question, context_chunks)
+        answer = await self._generate_answer(system_prompt, user_prompt)
+        
+        if cache_key is not None:
+            await self.cache.set(cache_key, {"answer": answer})
         
+        return answer
+    
+    async def _generate_answer(self, system_prompt: str, user_prompt: str) -> str:
+        """Send a RAG prompt to the configured provider."""
         try:
             if self.provider == "openai":
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "Eres un asistente experto en responder preguntas basándose en documentos institucionales."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature
+                response = await self._openai_create(
+                    messages=self._openai_messages(system_prompt, user_prompt)
                 )
                 
                 answer = response.choices[0].message.content.strip()
                 return answer
             
             elif self.provider == "gemini":
-                # Configurar parámetros de generación
-                generation_config = {
-                    "temperature": self.temperature,
-                    "max_output_tokens": self.max_tokens,
-                    "top_p": 0.95,
-                }
-                
-                # Configurar ajustes de seguridad (más permisivos para documentos técnicos)
-                safety_settings = [
-                    {
-                        "category": "HARM_CATEGORY_HARASSMENT",
-                        "threshold": "BLOCK_ONLY_HIGH"
-                    },
-                    {
-                        "category": "HARM_CATEGORY_HATE_SPEECH",
-                        "threshold": "BLOCK_ONLY_HIGH"
-                    },
-                    {
-                        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                        "threshold": "BLOCK_ONLY_HIGH"
-                    },
-                    {
-                        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                        "threshold": "BLOCK_ONLY_HIGH"
-                    },
-                ]
-                
-                # Generar respuesta
-                response = self.gemini_model.generate_content(
-                    prompt,
-                    generation_config=generation_config,
-                    safety_settings=safety_settings
+                # Generar respuesta (instrucciones estáticas primero: prefijo estable)
+                response = await self._gemini_generate(
+                    f"{system_prompt}\n\n{user_prompt}",
+                    generation_config=self._gemini_generation_config,
+                    safety_settings=_GEMINI_SAFETY_SETTINGS
                 )
                 
                 # Verificar si hay respuesta
@@ -187,30 +442,182 @@ RESPUESTA:"""
             logger.error(f"Error generating answer: {str(e)}")
             raise
     
-    def generate_simple_completion(self, prompt: str) -> str:
+    async def stream_answer(
+        self,
+        question: str,
+        context_chunks: List[Dict[str, any]]
+    ) -> AsyncIterator[str]:
+        """
+        Generate an answer like generate_answer(), yielding text deltas as
+        the provider produces them. Cached answers are yielded in one piece.
+        """
+        cache_key = None
+        if self.cache is not None and self.temperature == 0:
+            cache_key = LLMCache.make_key(
+                self.model,
+                self.temperature,
+                question,
+                [chunk.get("chunk_id") for chunk in context_chunks]
+            )
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                logger.info("LLM answer served from cache")
+                yield cached["answer"]
+                return
+        
+        system_prompt, user_prompt = self.build_rag_prompt(question, context_chunks)
+        parts = []
+        
+        try:
+            # The permit covers the whole stream, not just opening it
+            async with self._semaphore:
+                if self.provider == "openai":
+                    stream = await self._openai_create(
+                        messages=self._openai_messages(system_prompt, user_prompt),
+                        stream=True,
+                        acquire=False
+                    )
+                    
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+                
+                elif self.provider == "gemini":
+                    response = await self._gemini_generate(
+                        f"{system_prompt}\n\n{user_prompt}",
+                        generation_config=self._gemini_generation_config,
+                        safety_settings=_GEMINI_SAFETY_SETTINGS,
+                        stream=True,
+                        acquire=False
+                    )
+                    
+                    async for chunk in response:
+                        try:
+                            delta = chunk.text
+                        except ValueError:
+                            # Gemini bloquea el fragmento (sin partes de texto)
+                            logger.warning(f"Gemini blocked response: {getattr(response, 'prompt_feedback', None)}")
+                            if not parts:
+                                yield "Lo siento, la respuesta fue bloqueada por filtros de seguridad. Intenta reformular tu pregunta."
+                            return
+                        if delta:
+                            parts.append(delta)
+                            yield delta
+                
+                else:
+                    raise ValueError(f"Unsupported LLM provider: {self.provider}")
+        
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}")
+            raise
+        
+        if cache_key is not None and parts:
+            await self.cache.set(cache_key, {"answer": "".join(parts).strip()})
+    
+    async def generate_answers_batch(
+        self,
+        items: List[Tuple[str, List[Dict[str, any]]]],
+        use_batch_api: bool = False,
+        max_concurrency: int = 10
+    ) -> List[Optional[str]]:
+        """
+        Answer many (question, context_chunks) pairs.
+        Interactive use runs them concurrently (bounded by max_concurrency);
+        use_batch_api=True submits them to the OpenAI Batch API instead
+        (cheaper, but completes asynchronously within 24h, for bulk jobs).
+        Answers are returned in input order.
+        """
+        if use_batch_api:
+            if self.provider != "openai":
+                raise ValueError("The Batch API is only available for the openai provider")
+            return await self._generate_answers_batch_api(items)
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def answer(question: str, context_chunks: List[Dict[str, any]]) -> str:
+            async with semaphore:
+                return await self.generate_answer(question, context_chunks)
+        
+        return await asyncio.gather(*(answer(question, chunks) for question, chunks in items))
+    
+    async def _generate_answers_batch_api(
+        self,
+        items: List[Tuple[str, List[Dict[str, any]]]]
+    ) -> List[Optional[str]]:
+        """Run a batch of RAG prompts through the OpenAI Batch API and wait for it."""
+        lines = []
+        for i, (question, context_chunks) in enumerate(items):
+            system_prompt, user_prompt = self.build_rag_prompt(question, context_chunks)
+            lines.append(json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": self._openai_messages(system_prompt, user_prompt),
+                    "max_tokens": self.max_tokens,
+                    "temperature": self.temperature
+                }
+            }))
+        
+        try:
+            batch_file = await self.client.files.create(
+                file=("rag_batch.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch"
+            )
+            batch = await self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info(f"Submitted OpenAI batch {batch.id} with {len(items)} requests")
+            
+            while batch.status not in _BATCH_FINAL_STATUSES:
+                await asyncio.sleep(_BATCH_POLL_INTERVAL)
+                batch = await self.client.batches.retrieve(batch.id)
+            
+            if batch.status != "completed":
+                raise RuntimeError(f"OpenAI batch {batch.id} ended with status: {batch.status}")
+            
+            output = await self.client.files.content(batch.output_file_id)
+            
+            answers: List[Optional[str]] = [None] * len(items)
+            for line in output.text.splitlines():
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if record.get("error") or response.get("status_code") != 200:
+                    logger.warning(f"Batch request {record['custom_id']} failed: {record.get('error')}")
+                    continue
+                answers[int(record["custom_id"])] = (
+                    response["body"]["choices"][0]["message"]["content"].strip()
+                )
+            
+            return answers
+        
+        except Exception as e:
+            logger.error(f"Error in batch generation: {str(e)}")
+            raise
+    
+    async def generate_simple_completion(self, prompt: str) -> str:
         """
         Generate a simple completion without RAG context.
         """
         try:
             if self.provider == "openai":
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature
+                response = await self._openai_create(
+                    messages=[{"role": "user", "content": prompt}]
                 )
                 
                 return response.choices[0].message.content.strip()
             
             elif self.provider == "gemini":
-                generation_config = {
-                    "temperature": self.temperature,
-                    "max_output_tokens": self.max_tokens,
-                }
-                
-                response = self.gemini_model.generate_content(
+                response = await self._gemini_generate(
                     prompt,
-                    generation_config=generation_config
+                    generation_config=self._gemini_completion_config
                 )
                 
                 if response.text:
@@ -220,4 +627,17 @@ RESPUESTA:"""
         
         except Exception as e:
             logger.error(f"Error in completion: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    async def aclose(self):
+        """Close pooled HTTP connections."""
+        if self.provider == "openai":
+            await self.client.close()
+        if self.cache is not None:
+            await self.cache.close()
+
+
+@lru_cache(maxsize=1)
+def get_llm_client() -> LLMClient:
+    """Return the shared LLM client."""
+    return LLMClient()
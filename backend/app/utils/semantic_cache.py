@@ -0,0 +1,141 @@
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple, Union
+import itertools
+import threading
+
+
+class SemanticCache:
+    """
+    Query result cache keyed on query embeddings.
+    Near-duplicate questions are found with random-projection LSH
+    (one signed hash per table); exact repeats hit a plain dict first,
+    before any embedding is computed.
+    """
+    
+    def __init__(
+        self,
+        dimension: int,
+        n_tables: int = 8,
+        n_bits: int = 16,
+        max_entries: int = 1024,
+        seed: int = 0
+    ):
+        rng = np.random.default_rng(seed)
+        self.dimension = dimension
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.max_entries = max_entries
+        
+        # All hyperplanes stacked, so hashing is a single matmul
+        self._planes = rng.standard_normal((n_tables * n_bits, dimension)).astype(np.float32)
+        self._powers = 1 << np.arange(n_bits, dtype=np.int64)
+        
+        # entry id -> (scope, normalized embedding, bucket keys, exact key, value), LRU ordered
+        self._entries: "OrderedDict[int, Tuple[Hashable, np.ndarray, List[int], Optional[Tuple], Any]]" = OrderedDict()
+        self._tables: List[Dict[Tuple[Hashable, int], Set[int]]] = [{} for _ in range(n_tables)]
+        self._exact: Dict[Tuple, int] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _exact_key(question: str, scope: Hashable) -> Tuple:
+        # Whitespace and case differences don't change the question
+        return (scope, " ".join(question.split()).casefold())
+    
+    def _hash(self, embedding: Union[List[float], np.ndarray]) -> Tuple[np.ndarray, List[int]]:
+        """Normalize an embedding and compute its bucket key in every table."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        
+        bits = (self._planes @ vector > 0).reshape(self.n_tables, self.n_bits)
+        return vector, (bits @ self._powers).tolist()
+    
+    def get_exact(self, question: str, scope: Hashable = None) -> Optional[Any]:
+        """Return the cached value for the same question text, if any."""
+        with self._lock:
+            entry_id = self._exact.get(self._exact_key(question, scope))
+            if entry_id is None:
+                return None
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id][4]
+    
+    def get(
+        self,
+        embedding: Union[List[float], np.ndarray],
+        threshold: float = 0.97,
+        scope: Hashable = None
+    ) -> Optional[Any]:
+        """
+        Return the value of the most similar cached query whose cosine
+        similarity is at least threshold, if any.
+        """
+        vector, keys = self._hash(embedding)
+        
+        with self._lock:
+            candidates: Set[int] = set()
+            for table, key in zip(self._tables, keys):
+                bucket = table.get((scope, key))
+                if bucket:
+                    candidates |= bucket
+            
+            best_id, best_score = None, threshold
+            for entry_id in candidates:
+                score = float(np.dot(vector, self._entries[entry_id][1]))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][4]
+    
+    def set(
+        self,
+        embedding: Union[List[float], np.ndarray],
+        value: Any,
+        question: Optional[str] = None,
+        scope: Hashable = None
+    ):
+        """Cache a value under a query embedding (and its question text)."""
+        vector, keys = self._hash(embedding)
+        exact_key = self._exact_key(question, scope) if question is not None else None
+        
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (scope, vector, keys, exact_key, value)
+            for table, key in zip(self._tables, keys):
+                table.setdefault((scope, key), set()).add(entry_id)
+            if exact_key is not None:
+                old_id = self._exact.get(exact_key)
+                if old_id is not None:
+                    self._remove(old_id)
+                self._exact[exact_key] = entry_id
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+    
+    def _remove(self, entry_id: int):
+        """Drop an entry from every index. Caller holds the lock."""
+        scope, _, keys, exact_key, _ = self._entries.pop(entry_id)
+        for table, key in zip(self._tables, keys):
+            bucket = table.get((scope, key))
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[(scope, key)]
+        if exact_key is not None and self._exact.get(exact_key) == entry_id:
+            del self._exact[exact_key]
+    
+    def clear(self):
+        """Drop all entries (e.g. when the document set changes)."""
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()
+            self._exact.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
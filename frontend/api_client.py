@@ -0,0 +1,110 @@
+import streamlit as st
+import asyncio
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from threading import Thread
+
+# Applied to calls that don't pass their own timeout
+DEFAULT_TIMEOUT = 30  # seconds
+
+# For streamed responses: a compressed stream is buffered until it ends
+NO_COMPRESSION = {"Accept-Encoding": "identity"}
+
+
+class APISession(requests.Session):
+    """requests.Session with a default timeout."""
+    
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """
+    Shared HTTP session for all backend calls.
+    Kept across reruns and pages, so keep-alive connections are reused
+    instead of opening a new one per request.
+    Connection errors and 502/503/504 on idempotent requests are retried
+    with backoff; the last response is returned, not raised.
+    """
+    session = APISession()
+    # requests decodes gzip/deflate transparently (br only with brotli installed)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False
+        )
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def error_detail(response) -> str:
+    """
+    Error message from a non-200 backend response (requests or httpx).
+    Only JSON bodies are parsed; proxy/gateway error pages (HTML) are
+    returned as a short text excerpt instead of raising.
+    """
+    text = response.text[:200] or f"HTTP {response.status_code}"
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        return text
+    try:
+        return response.json().get("detail", text)
+    except ValueError:
+        return text
+
+
+@st.cache_resource
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Background event loop shared across reruns and pages.
+    All async backend calls run here, so the cached AsyncClient is
+    always used from the loop it is bound to.
+    """
+    loop = asyncio.new_event_loop()
+    Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def run_async(coro):
+    """Run a coroutine on the background loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+
+def iter_async(async_gen):
+    """Iterate an async generator from the script thread via the background loop."""
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(async_gen.__anext__(), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        asyncio.run_coroutine_threadsafe(async_gen.aclose(), loop).result()
+
+
+@st.cache_resource
+def get_async_client(base_url: str) -> httpx.AsyncClient:
+    """
+    Shared async client for the concurrent paths (bulk operations, hedged
+    requests). HTTP/2 multiplexes them over one connection when the backend
+    is reached over TLS; plain http:// stays on pooled HTTP/1.1 keep-alive.
+    Call it on the script thread (it is a cache_resource) and pass the
+    client to coroutines run with run_async/iter_async.
+    """
+    return httpx.AsyncClient(
+        base_url=base_url,
+        http2=True,
+        timeout=httpx.Timeout(5, read=120),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+    )
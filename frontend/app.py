@@ -1,5 +1,5 @@
 import streamlit as st
-import requests
+from api_client import get_session
 from datetime import datetime
 import os
 
@@ -36,23 +36,41 @@ st.markdown("""
 if 'api_healthy' not in st.session_state:
     st.session_state.api_healthy = False
 
-def check_api_health():
-    """Check if the API is healthy."""
+@st.cache_data(ttl=10)
+def fetch_health():
+    """Fetch backend health (cached briefly, reruns reuse it)."""
     try:
-        response = requests.get(f"{API_BASE_URL}/query/health", timeout=5)
+        response = get_session().get(f"{API_BASE_URL}/query/health", timeout=5)
         if response.status_code == 200:
-            data = response.json()
-            return data.get("status") == "healthy"
-        return False
+            return response.json()
+        return None
     except:
-        return False
+        return None
+
+@st.cache_data(ttl=30)
+def fetch_documents():
+    """Fetch the indexed document list (cached briefly)."""
+    response = get_session().get(f"{API_BASE_URL}/documents/list")
+    if response.status_code == 200:
+        return response.json()
+    return None
+
+def check_api_health(health_data):
+    """Check if the API is healthy."""
+    return bool(health_data) and health_data.get("status") == "healthy"
 
 # Main page
 st.title("📚 Sistema RAG de Preguntas y Respuestas")
+
+if st.button("🔄 Actualizar"):
+    fetch_health.clear()
+    fetch_documents.clear()
+
 st.markdown("---")
 
-# Check API health
-st.session_state.api_healthy = check_api_health()
+# Check API health (one request, reused for the metrics below)
+health_data = fetch_health()
+st.session_state.api_healthy = check_api_health(health_data)
 
 if st.session_state.api_healthy:
     st.success("✅ Sistema conectado y funcionando")
@@ -61,23 +79,16 @@ else:
     st.stop()
 
 # Display system info
-try:
-    response = requests.get(f"{API_BASE_URL}/query/health")
-    if response.status_code == 200:
-        health_data = response.json()
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric("Estado de Milvus", "Conectado" if health_data.get("milvus_connected") else "Desconectado")
-        
-        with col2:
-            st.metric("Total de Documentos", health_data.get("total_documents", 0))
-        
-        with col3:
-            st.metric("Chunks Totales", health_data.get("total_chunks", 0))
-except:
-    pass
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    st.metric("Estado de Milvus", "Conectado" if health_data.get("milvus_connected") else "Desconectado")
+
+with col2:
+    st.metric("Total de Documentos", health_data.get("total_documents", 0))
+
+with col3:
+    st.metric("Chunks Totales", health_data.get("total_chunks", 0))
 
 st.markdown("---")
 
@@ -113,9 +124,8 @@ st.markdown("---")
 st.subheader("📊 Estadísticas Rápidas")
 
 try:
-    response = requests.get(f"{API_BASE_URL}/documents/list")
-    if response.status_code == 200:
-        data = response.json()
+    data = fetch_documents()
+    if data is not None:
         documents = data.get("documents", [])
         
         if documents:
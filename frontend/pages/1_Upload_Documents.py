@@ -1,5 +1,8 @@
 import streamlit as st
 import requests
+from api_client import NO_COMPRESSION, error_detail, get_session
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
 import os
 import time
 
@@ -13,6 +16,58 @@ st.set_page_config(
 # API Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://backend:8000")
 
+# Status text for each ingest stage reported by the backend
+STAGE_LABELS = {
+    "extract": "📖 Extrayendo texto del PDF...",
+    "embed": "🔄 Generando embeddings...",
+    "index": "💾 Indexando en Milvus..."
+}
+
+# Files uploaded and processed at the same time when several are selected
+MAX_PARALLEL_UPLOADS = 4
+
+def upload_and_process(file, process: bool) -> dict:
+    """
+    Upload one file and optionally ingest it.
+    Runs in a worker thread, so it only talks to the API (no st.* calls).
+    """
+    result = {"filename": file.name}
+    try:
+        file.seek(0)
+        upload_response = get_session().post(
+            f"{API_BASE_URL}/documents/upload",
+            files={'file': (file.name, file, 'application/pdf')},
+            timeout=60
+        )
+        if upload_response.status_code != 200:
+            result["error"] = f"Error subiendo documento: {error_detail(upload_response)}"
+            return result
+        
+        upload_data = upload_response.json()
+        result["document_id"] = upload_data["document_id"]
+        result["filename"] = upload_data["filename"]
+        
+        if process:
+            ingest_response = get_session().post(
+                f"{API_BASE_URL}/ingest/process",
+                json={
+                    "document_id": result["document_id"],
+                    "filename": result["filename"]
+                },
+                timeout=300
+            )
+            if ingest_response.status_code != 200:
+                result["error"] = f"Error procesando documento: {ingest_response.text}"
+                return result
+            result["chunks_processed"] = ingest_response.json().get("chunks_processed", 0)
+    
+    except requests.exceptions.Timeout:
+        result["error"] = "Timeout: el documento es muy grande o el servidor está ocupado."
+    except Exception as e:
+        result["error"] = str(e)
+    
+    return result
+
 st.title("📤 Subir y Procesar Documentos")
 st.markdown("---")
 
@@ -20,27 +75,43 @@ st.markdown("---")
 if 'uploaded_docs' not in st.session_state:
     st.session_state.uploaded_docs = []
 
+# Manage Documents keeps a per-session copy of the list and Ask Questions
+# caches the count by generation; invalidate both after uploads
+def mark_documents_changed():
+    st.session_state.pop("documents", None)
+    st.session_state["_docs_gen"] = st.session_state.get("_docs_gen", 0) + 1
+
 # File uploader
-st.subheader("1. Seleccionar Archivo PDF")
-uploaded_file = st.file_uploader(
-    "Arrastra o selecciona un archivo PDF",
+st.subheader("1. Seleccionar Archivos PDF")
+uploaded_files = st.file_uploader(
+    "Arrastra o selecciona uno o más archivos PDF",
     type=['pdf'],
+    accept_multiple_files=True,
     help="Solo se permiten archivos PDF. Tamaño máximo: 10MB"
 )
 
-if uploaded_file is not None:
-    # Display file info
-    file_details = {
-        "Nombre": uploaded_file.name,
-        "Tipo": uploaded_file.type,
-        "Tamaño": f"{uploaded_file.size / 1024:.2f} KB"
-    }
-    
-    st.info("📄 Archivo seleccionado")
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Nombre", file_details["Nombre"])
-    col2.metric("Tipo", file_details["Tipo"])
-    col3.metric("Tamaño", file_details["Tamaño"])
+if uploaded_files:
+    if len(uploaded_files) == 1:
+        uploaded_file = uploaded_files[0]
+        
+        # Display file info
+        file_details = {
+            "Nombre": uploaded_file.name,
+            "Tipo": uploaded_file.type,
+            "Tamaño": f"{uploaded_file.size / 1024:.2f} KB"
+        }
+        
+        st.info("📄 Archivo seleccionado")
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Nombre", file_details["Nombre"])
+        col2.metric("Tipo", file_details["Tipo"])
+        col3.metric("Tamaño", file_details["Tamaño"])
+    else:
+        st.info(f"📄 {len(uploaded_files)} archivos seleccionados")
+        st.table([
+            {"Nombre": file.name, "Tamaño": f"{file.size / 1024:.2f} KB"}
+            for file in uploaded_files
+        ])
     
     st.markdown("---")
     
@@ -66,16 +137,54 @@ if uploaded_file is not None:
     st.markdown("---")
     
     # Upload button
-    if st.button("🚀 Subir Documento", type="primary", use_container_width=True):
+    upload_clicked = st.button("🚀 Subir Documento(s)", type="primary", use_container_width=True)
+    
+    if upload_clicked and len(uploaded_files) > 1:
+        # Several files: upload and ingest them concurrently
+        st.subheader("3. Procesando Documentos")
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_UPLOADS) as executor:
+            futures = [
+                executor.submit(upload_and_process, file, process_immediately)
+                for file in uploaded_files
+            ]
+            
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                progress_bar.progress(int(100 * done / len(futures)))
+                status_text.text(f"{done}/{len(futures)} documentos completados")
+                
+                if "document_id" in result:
+                    st.session_state.uploaded_docs.append({
+                        "document_id": result["document_id"],
+                        "filename": result["filename"],
+                        "upload_time": time.time()
+                    })
+                    mark_documents_changed()
+                
+                if "error" in result:
+                    st.error(f"❌ {result['filename']}: {result['error']}")
+                elif process_immediately:
+                    st.success(f"✅ {result['filename']}: {result['chunks_processed']} chunks indexados")
+                else:
+                    st.success(f"✅ {result['filename']} subido")
+        
+        if not process_immediately:
+            st.info("💡 Documentos subidos pero no procesados. Ve a la página 'Manage Documents' para procesarlos.")
+    
+    elif upload_clicked:
         with st.spinner("Subiendo documento..."):
             try:
-                # Prepare file for upload
+                # Prepare file for upload (file object passed as-is, no extra bytes copy)
+                uploaded_file.seek(0)
                 files = {
-                    'file': (uploaded_file.name, uploaded_file.getvalue(), 'application/pdf')
+                    'file': (uploaded_file.name, uploaded_file, 'application/pdf')
                 }
                 
                 # Upload file
-                upload_response = requests.post(
+                upload_response = get_session().post(
                     f"{API_BASE_URL}/documents/upload",
                     files=files,
                     timeout=60
@@ -95,6 +204,7 @@ if uploaded_file is not None:
                         "filename": filename,
                         "upload_time": time.time()
                     })
+                    mark_documents_changed()
                     
                     # Process if option is selected
                     if process_immediately:
@@ -105,36 +215,40 @@ if uploaded_file is not None:
                         status_text = st.empty()
                         
                         try:
-                            # Step 1: Extract text
-                            if show_progress:
-                                status_text.text("📖 Extrayendo texto del PDF...")
-                                progress_bar.progress(20)
-                                time.sleep(0.5)
+                            status_text.text("📖 Extrayendo texto del PDF...")
                             
-                            # Step 2: Chunking
-                            if show_progress:
-                                status_text.text("✂️ Dividiendo texto en fragmentos...")
-                                progress_bar.progress(40)
-                                time.sleep(0.5)
-                            
-                            # Step 3: Generate embeddings and index
-                            status_text.text("🔄 Generando embeddings e indexando...")
-                            progress_bar.progress(60)
-                            
-                            ingest_response = requests.post(
-                                f"{API_BASE_URL}/ingest/process",
+                            # Real progress is streamed by the backend as NDJSON
+                            ingest_data = None
+                            ingest_error = None
+                            with get_session().post(
+                                f"{API_BASE_URL}/ingest/process-stream",
                                 json={
                                     "document_id": document_id,
                                     "filename": filename
                                 },
+                                headers=NO_COMPRESSION,
+                                stream=True,
                                 timeout=300
-                            )
-                            
-                            progress_bar.progress(80)
+                            ) as ingest_response:
+                                if ingest_response.status_code != 200:
+                                    ingest_error = error_detail(ingest_response)
+                                else:
+                                    for line in ingest_response.iter_lines():
+                                        if not line:
+                                            continue
+                                        event = json.loads(line)
+                                        
+                                        if event["stage"] == "error":
+                                            ingest_error = event.get("detail", "Error desconocido")
+                                            break
+                                        
+                                        progress_bar.progress(event["percent"])
+                                        if event["stage"] == "done":
+                                            ingest_data = event
+                                        elif show_progress:
+                                            status_text.text(STAGE_LABELS.get(event["stage"], event["stage"]))
                             
-                            if ingest_response.status_code == 200:
-                                ingest_data = ingest_response.json()
-                                progress_bar.progress(100)
+                            if ingest_data is not None:
                                 status_text.text("✅ ¡Procesamiento completado!")
                                 
                                 st.success("🎉 Documento procesado e indexado exitosamente")
@@ -157,15 +271,12 @@ if uploaded_file is not None:
                                     )
                                 
                                 with col3:
-                                    st.metric(
-                                        "Estado",
-                                        "Completado" if ingest_data.get("success") else "Error"
-                                    )
+                                    st.metric("Estado", "Completado")
                                 
                                 st.balloons()
                                 
                             else:
-                                st.error(f"❌ Error procesando documento: {ingest_response.text}")
+                                st.error(f"❌ Error procesando documento: {ingest_error}")
                         
                         except requests.exceptions.Timeout:
                             st.error("⏱️ Timeout procesando documento. El documento es muy grande o el servidor está ocupado.")
@@ -176,8 +287,7 @@ if uploaded_file is not None:
                         st.info("💡 Documento subido pero no procesado. Ve a la página 'Manage Documents' para procesarlo.")
                 
                 else:
-                    error_detail = upload_response.json().get("detail", "Error desconocido")
-                    st.error(f"❌ Error subiendo documento: {error_detail}")
+                    st.error(f"❌ Error subiendo documento: {error_detail(upload_response)}")
             
             except requests.exceptions.Timeout:
                 st.error("⏱️ Timeout subiendo documento. El archivo es muy grande.")
@@ -203,9 +313,9 @@ st.subheader("📖 Instrucciones")
 st.markdown("""
 ### Cómo usar esta página:
 
-1. **Selecciona un archivo PDF** usando el selector de archivos
+1. **Selecciona uno o más archivos PDF** usando el selector de archivos
 2. **Configura las opciones** de procesamiento según tus necesidades
-3. **Haz clic en "Subir Documento"** para comenzar
+3. **Haz clic en "Subir Documento(s)"** para comenzar (varios archivos se procesan en paralelo)
 4. **Espera el procesamiento** (si está habilitado) - puede tomar varios minutos para documentos grandes
 5. **Ve a "Ask Questions"** para comenzar a hacer preguntas sobre tus documentos
 
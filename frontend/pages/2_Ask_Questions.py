@@ -1,6 +1,15 @@
 import streamlit as st
 import requests
+from api_client import NO_COMPRESSION, error_detail, get_async_client, get_session, run_async
+from collections import OrderedDict
+from threading import Lock
+import asyncio
+import httpx
+import json
 import os
+import textwrap
+import time
+import uuid
 from datetime import datetime
 
 # Page config
@@ -13,26 +22,208 @@ st.set_page_config(
 # API Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://backend:8000")
 
+# Seconds (about the backend's P95) before a duplicate request is sent
+HEDGE_AFTER = float(os.getenv("HEDGE_AFTER", "4.0"))
+
+# Full answer payloads kept per session; older history entries keep only a preview
+MAX_STORED_ANSWERS = 20
+
 st.title("💬 Preguntas y Respuestas")
 st.markdown("---")
 
 # Initialize session state
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
+if '_answers' not in st.session_state:
+    st.session_state._answers = OrderedDict()
 
 # Check if there are documents
-@st.cache_data(ttl=10)
-def get_document_count():
+def docs_generation():
+    """
+    Cache key for document-derived data: the backend etag (changes on
+    ingest/delete in any session) plus this session's mutation counter.
+    """
     try:
-        response = requests.get(f"{API_BASE_URL}/documents/list")
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("total_count", 0)
-    except:
-        return 0
-    return 0
+        response = get_session().get(f"{API_BASE_URL}/documents/etag", timeout=5)
+        etag = response.json().get("etag") if response.status_code == 200 else None
+    except Exception:
+        etag = None
+    return etag, st.session_state.get("_docs_gen", 0)
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def get_document_count(docs_gen):
+    """Cached until docs_gen changes; errors are raised, so never cached."""
+    # Count only; the full listing is not needed here
+    response = get_session().get(f"{API_BASE_URL}/documents/count")
+    response.raise_for_status()
+    return response.json().get("total_count", 0)
+
+class APIError(Exception):
+    """Non-200 response from the backend (not cached by search_backend)."""
+
+def normalize_question(question):
+    """Cache key only; the backend always gets the question as typed."""
+    return " ".join(question.lower().split())
+
+async def hedged_post(client, url, body, timeout, hedge_after=HEDGE_AFTER):
+    """
+    POST body to url; if no response arrives within hedge_after seconds,
+    send the same request again and return whichever succeeds first.
+    Only for read-only endpoints, since the backend may run it twice.
+    Runs on the background loop, so client is fetched by the caller.
+    """
+    first = asyncio.create_task(client.post(url, json=body, timeout=timeout))
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+    
+    second = asyncio.create_task(client.post(url, json=body, timeout=timeout))
+    pending = {first, second}
+    failed = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return task.result()
+            # Keep waiting on the other request instead of failing early
+            failed = task
+    
+    return failed.result()
+
+@st.cache_data(ttl=300, max_entries=256, show_spinner=False)
+def search_backend(question_norm, top_k, _question):
+    """
+    Semantic search (no answer generation) for _question as typed.
+    Repeated questions (same normalized text and top_k) are served from
+    the cache; _question is not part of the cache key. Errors are raised,
+    so they are never cached. Full answers are streamed by stream_answer.
+    """
+    response = run_async(hedged_post(
+        get_async_client(API_BASE_URL),
+        f"{API_BASE_URL}/query/search",
+        {
+            "question": _question,
+            "top_k": top_k
+        },
+        timeout=httpx.Timeout(60, connect=5)
+    ))
+    
+    if response.status_code != 200:
+        raise APIError(error_detail(response))
+    return response.json()
+
+class AnswerCache:
+    """
+    Streamed answers by (normalized question, top_k), with the same TTL and
+    size as search_backend. Shared by all sessions, so access is locked.
+    """
+    
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+@st.cache_resource
+def get_answer_cache():
+    return AnswerCache()
+
+def stream_answer(question, top_k, result, on_chunks=None):
+    """
+    Yield answer text from /query/ask_stream as it is generated.
+    The retrieved chunks and processing time are stored in result;
+    on_chunks(chunks) is called as soon as the chunks arrive.
+    """
+    with get_session().post(
+        f"{API_BASE_URL}/query/ask_stream",
+        json={
+            "question": question,
+            "top_k": top_k
+        },
+        headers=NO_COMPRESSION,
+        stream=True,
+        timeout=(5, 60)  # read timeout applies between streamed events
+    ) as response:
+        if response.status_code != 200:
+            raise APIError(error_detail(response))
+        
+        # text/event-stream has no charset, so requests would yield bytes
+        response.encoding = "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line.startswith("data:"):
+                continue
+            event = json.loads(line[5:])
+            
+            if event["type"] == "delta":
+                yield event["delta"]
+            elif event["type"] == "chunks":
+                result["retrieved_chunks"] = event["retrieved_chunks"]
+                if on_chunks is not None:
+                    on_chunks(event["retrieved_chunks"])
+            elif event["type"] == "done":
+                result["processing_time"] = event["processing_time"]
+            elif event["type"] == "error":
+                raise APIError(event["detail"])
+
+def render_chunks(chunks, show_metadata):
+    """Show retrieved chunks as expanders."""
+    st.markdown("---")
+    st.subheader("📚 Fragmentos Relevantes Encontrados")
+    
+    if chunks:
+        for idx, chunk in enumerate(chunks, 1):
+            with st.expander(f"📄 Fragmento {idx} (Relevancia: {chunk.get('score', 0):.4f})"):
+                st.markdown(chunk.get("text", ""))
+                
+                if show_metadata:
+                    st.markdown("---")
+                    metadata = chunk.get("metadata", {})
+                    col1, col2, col3 = st.columns(3)
+                    
+                    with col1:
+                        st.caption(f"📁 **Archivo:** {metadata.get('filename', 'N/A')}")
+                    
+                    with col2:
+                        st.caption(f"📄 **Página:** {metadata.get('page_number', 'N/A')}")
+                    
+                    with col3:
+                        st.caption(f"🔢 **Chunk:** {metadata.get('chunk_index', 'N/A')}")
+    else:
+        st.warning("No se encontraron fragmentos relevantes para tu pregunta.")
 
-doc_count = get_document_count()
+def remember_answer(data):
+    """Store a full answer payload (LRU, MAX_STORED_ANSWERS) and return its id."""
+    qid = uuid.uuid4().hex
+    answers = st.session_state._answers
+    answers[qid] = data
+    while len(answers) > MAX_STORED_ANSWERS:
+        answers.popitem(last=False)
+    return qid
+
+try:
+    doc_count = get_document_count(docs_generation())
+except Exception:
+    doc_count = 0
 
 if doc_count == 0:
     st.warning("⚠️ No hay documentos indexados en el sistema.")
@@ -73,19 +264,12 @@ with st.sidebar:
     
     if st.button("🗑️ Limpiar Historial"):
         st.session_state.chat_history = []
+        st.session_state._answers.clear()
         st.rerun()
 
 # Main content
 st.subheader("🤔 Haz una Pregunta")
 
-# Question input
-question = st.text_area(
-    "Escribe tu pregunta aquí:",
-    placeholder="Ejemplo: ¿Cuál es la política de vacaciones de la empresa?",
-    height=100,
-    help="Escribe una pregunta específica sobre el contenido de tus documentos"
-)
-
 # Example questions
 with st.expander("💡 Ver ejemplos de preguntas"):
     st.markdown("""
@@ -105,107 +289,103 @@ with st.expander("💡 Ver ejemplos de preguntas"):
     ❌ Evita preguntas muy generales o ambiguas
     """)
 
-col1, col2 = st.columns([3, 1])
-
-with col1:
-    ask_button = st.button("🔍 Buscar Respuesta", type="primary", use_container_width=True)
-
-with col2:
-    search_only = st.checkbox("Solo búsqueda", help="Realizar búsqueda semántica sin generar respuesta")
+# Question form: typing doesn't rerun the page, only submitting does
+with st.form("ask_form"):
+    question = st.text_area(
+        "Escribe tu pregunta aquí:",
+        placeholder="Ejemplo: ¿Cuál es la política de vacaciones de la empresa?",
+        height=100,
+        help="Escribe una pregunta específica sobre el contenido de tus documentos"
+    )
+    
+    col1, col2 = st.columns([3, 1])
+    
+    with col1:
+        ask_button = st.form_submit_button("🔍 Buscar Respuesta", type="primary", use_container_width=True)
+    
+    with col2:
+        search_only = st.checkbox("Solo búsqueda", help="Realizar búsqueda semántica sin generar respuesta")
 
 # Process question
-if ask_button and question.strip():
-    with st.spinner("🤔 Analizando tu pregunta y buscando información..."):
-        try:
-            if search_only:
-                # Semantic search only
-                response = requests.post(
-                    f"{API_BASE_URL}/query/search",
-                    json={
-                        "question": question,
-                        "top_k": top_k
-                    },
-                    timeout=60
-                )
-            else:
-                # Full RAG query
-                response = requests.post(
-                    f"{API_BASE_URL}/query/ask",
-                    json={
-                        "question": question,
-                        "top_k": top_k
-                    },
-                    timeout=120
-                )
-            
-            if response.status_code == 200:
-                data = response.json()
+if ask_button:
+    if not question.strip():
+        st.warning("⚠️ Por favor escribe una pregunta antes de buscar.")
+    elif st.session_state.get("_inflight"):
+        # A rerun while a query is running must not start a second one
+        st.info("⏳ Ya hay una consulta en curso, espera a que termine.")
+    else:
+        st.session_state["_inflight"] = True
+        with st.spinner("🤔 Analizando tu pregunta y buscando información..."):
+            try:
+                question_norm = normalize_question(question)
                 
-                # Add to chat history
-                st.session_state.chat_history.append({
-                    "question": question,
-                    "data": data,
-                    "timestamp": datetime.now(),
-                    "search_only": search_only
-                })
+                if search_only:
+                    data = search_backend(question_norm, top_k, question)
+                else:
+                    data = get_answer_cache().get((question_norm, top_k))
                 
                 # Display result
                 st.markdown("---")
-                st.success("✅ Respuesta generada exitosamente")
+                answer_container = st.container()
+                # Filled as soon as the chunks are known (before the answer when streaming)
+                chunks_container = st.container()
+                
+                def show_retrieved_chunks(chunks):
+                    if show_chunks:
+                        with chunks_container:
+                            render_chunks(chunks, show_metadata)
                 
                 if not search_only:
-                    # Show answer
-                    st.subheader("📝 Respuesta")
-                    st.markdown(f"**Pregunta:** {question}")
-                    st.markdown("**Respuesta:**")
-                    st.info(data["answer"])
-                    
-                    # Show processing time
-                    processing_time = data.get("processing_time", 0)
-                    st.caption(f"⏱️ Tiempo de procesamiento: {processing_time:.2f} segundos")
+                    with answer_container:
+                        # Show answer
+                        st.subheader("📝 Respuesta")
+                        st.markdown(f"**Pregunta:** {question}")
+                        st.markdown("**Respuesta:**")
+                        
+                        if data is None:
+                            # Render the answer as it is generated; the chunks
+                            # arrive first and are shown right away
+                            result = {}
+                            answer = st.write_stream(stream_answer(
+                                question, top_k, result, on_chunks=show_retrieved_chunks
+                            ))
+                            data = {
+                                "answer": answer,
+                                "retrieved_chunks": result.get("retrieved_chunks", []),
+                                "processing_time": result.get("processing_time", 0)
+                            }
+                            get_answer_cache().set((question_norm, top_k), data)
+                        else:
+                            st.info(data["answer"])
+                            show_retrieved_chunks(data.get("retrieved_chunks", []))
+                        
+                        # Show processing time
+                        processing_time = data.get("processing_time", 0)
+                        st.caption(f"⏱️ Tiempo de procesamiento: {processing_time:.2f} segundos")
+                        
+                        st.success("✅ Respuesta generada exitosamente")
+                else:
+                    answer_container.success("✅ Respuesta generada exitosamente")
+                    show_retrieved_chunks(data.get("results", []))
                 
-                # Show retrieved chunks
-                if show_chunks:
-                    st.markdown("---")
-                    st.subheader("📚 Fragmentos Relevantes Encontrados")
-                    
-                    if search_only:
-                        chunks = data.get("results", [])
-                    else:
-                        chunks = data.get("retrieved_chunks", [])
-                    
-                    if chunks:
-                        for idx, chunk in enumerate(chunks, 1):
-                            with st.expander(f"📄 Fragmento {idx} (Relevancia: {chunk.get('score', 0):.4f})"):
-                                st.markdown(chunk.get("text", ""))
-                                
-                                if show_metadata:
-                                    st.markdown("---")
-                                    metadata = chunk.get("metadata", {})
-                                    col1, col2, col3 = st.columns(3)
-                                    
-                                    with col1:
-                                        st.caption(f"📁 **Archivo:** {metadata.get('filename', 'N/A')}")
-                                    
-                                    with col2:
-                                        st.caption(f"📄 **Página:** {metadata.get('page_number', 'N/A')}")
-                                    
-                                    with col3:
-                                        st.caption(f"🔢 **Chunk:** {metadata.get('chunk_index', 'N/A')}")
-                    else:
-                        st.warning("No se encontraron fragmentos relevantes para tu pregunta.")
+                # Add to chat history (the full payload is kept apart, see remember_answer)
+                st.session_state.chat_history.append({
+                    "question": question,
+                    "qid": remember_answer(data),
+                    "timestamp": datetime.now(),
+                    "search_only": search_only,
+                    "chunks_count": len(data.get("retrieved_chunks", []) or data.get("results", [])),
+                    "answer_preview": textwrap.shorten(data.get("answer", ""), width=200, placeholder="...")
+                })
             
-            else:
-                error_detail = response.json().get("detail", "Error desconocido")
-                st.error(f"❌ Error: {error_detail}")
-        
-        except requests.exceptions.Timeout:
-            st.error("⏱️ Timeout - La consulta tardó demasiado. Intenta con una pregunta más específica.")
-        except Exception as e:
-            st.error(f"❌ Error procesando pregunta: {str(e)}")
-
-elif ask_button:
-    st.warning("⚠️ Por favor escribe una pregunta antes de buscar.")
+            except APIError as e:
+                st.error(f"❌ Error: {str(e)}")
+            except (requests.exceptions.Timeout, httpx.TimeoutException):
+                st.error("⏱️ Timeout - La consulta tardó demasiado. Intenta con una pregunta más específica.")
+            except Exception as e:
+                st.error(f"❌ Error procesando pregunta: {str(e)}")
+            finally:
+                st.session_state["_inflight"] = False
 
 # Display chat history
 if st.session_state.chat_history:
@@ -220,10 +400,13 @@ if st.session_state.chat_history:
             
             if not entry['search_only']:
                 st.markdown("**Respuesta:**")
-                st.info(entry['data'].get('answer', 'N/A'))
+                data = st.session_state._answers.get(entry['qid'])
+                if data is not None:
+                    st.info(data.get('answer', 'N/A'))
+                else:
+                    st.info(entry['answer_preview'])
             
-            chunks_count = len(entry['data'].get('retrieved_chunks', []) or entry['data'].get('results', []))
-            st.caption(f"📚 {chunks_count} fragmentos recuperados")
+            st.caption(f"📚 {entry['chunks_count']} fragmentos recuperados")
 
 # Instructions
 st.markdown("---")
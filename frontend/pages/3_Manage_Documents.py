@@ -1,5 +1,6 @@
 import streamlit as st
-import requests
+from api_client import get_async_client, get_session, iter_async
+import asyncio
 import os
 from datetime import datetime
 import pandas as pd
@@ -14,28 +15,78 @@ st.set_page_config(
 # API Configuration
 API_BASE_URL = os.getenv("API_BASE_URL", "http://backend:8000")
 
+# Concurrent requests per bulk operation (keeps the backend pool from saturating)
+BULK_CONCURRENCY = 8
+
 st.title("📋 Gestión de Documentos")
 st.markdown("---")
 
+def parse_upload_date(value):
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
 # Function to get documents
 @st.cache_data(ttl=5)
 def get_documents():
     try:
-        response = requests.get(f"{API_BASE_URL}/documents/list")
+        response = get_session().get(f"{API_BASE_URL}/documents/list")
         if response.status_code == 200:
-            data = response.json()
-            return data.get("documents", [])
+            documents = response.json().get("documents", [])
+            # Parsed once per fetch instead of once per render
+            for doc in documents:
+                doc["_upload_dt"] = parse_upload_date(doc.get("upload_date", ""))
+            return documents
     except Exception as e:
         st.error(f"Error obteniendo documentos: {str(e)}")
     return []
 
+# Documents plus their lowercased filenames, for the search filter
+@st.cache_data(ttl=5)
+def get_documents_with_index():
+    documents = get_documents()
+    return documents, [doc.get("filename", "").lower() for doc in documents]
+
+# The page works on a per-session copy of the list, patched after each
+# mutation; it is only refetched on "Actualizar" (or after uploads)
+def load_documents():
+    """Fetch the list into the session, bypassing the short-TTL listing caches."""
+    get_documents.clear()
+    get_documents_with_index.clear()
+    documents, lowercase_names = get_documents_with_index()
+    st.session_state.documents = list(documents)
+    st.session_state.document_names = list(lowercase_names)
+
+def invalidate_documents():
+    """Drop the cached listing so the next full load is fresh."""
+    get_documents.clear()
+    get_documents_with_index.clear()
+    # Document-derived caches on other pages are keyed by this counter
+    st.session_state["_docs_gen"] = st.session_state.get("_docs_gen", 0) + 1
+
+def remove_documents(document_ids):
+    keep = [
+        i for i, doc in enumerate(st.session_state.documents)
+        if doc.get("document_id") not in document_ids
+    ]
+    st.session_state.documents = [st.session_state.documents[i] for i in keep]
+    st.session_state.document_names = [st.session_state.document_names[i] for i in keep]
+    invalidate_documents()
+
+def patch_chunk_count(document_id, chunk_count):
+    for doc in st.session_state.documents:
+        if doc.get("document_id") == document_id:
+            doc["chunk_count"] = chunk_count
+    invalidate_documents()
+
 # Function to delete document
 def delete_document(document_id, filename):
     try:
-        response = requests.delete(f"{API_BASE_URL}/documents/{document_id}")
+        response = get_session().delete(f"{API_BASE_URL}/documents/{document_id}")
         if response.status_code == 200:
             st.success(f"✅ Documento '{filename}' eliminado exitosamente")
-            st.cache_data.clear()
+            remove_documents({document_id})
             return True
         else:
             st.error(f"❌ Error eliminando documento: {response.text}")
@@ -48,13 +99,13 @@ def delete_document(document_id, filename):
 def reindex_document(document_id, filename):
     try:
         with st.spinner(f"Reindexando '{filename}'..."):
-            response = requests.post(f"{API_BASE_URL}/ingest/reindex/{document_id}")
+            response = get_session().post(f"{API_BASE_URL}/ingest/reindex/{document_id}")
             if response.status_code == 200:
                 data = response.json()
                 st.success(f"✅ Documento reindexado exitosamente")
                 st.info(f"Chunks antiguos eliminados: {data.get('old_chunks_deleted', 0)}")
                 st.info(f"Chunks nuevos creados: {data.get('new_chunks_created', 0)}")
-                st.cache_data.clear()
+                patch_chunk_count(document_id, data.get("new_chunks_created", 0))
                 return True
             else:
                 st.error(f"❌ Error reindexando: {response.text}")
@@ -63,15 +114,118 @@ def reindex_document(document_id, filename):
         st.error(f"❌ Error: {str(e)}")
         return False
 
+# Table view data, built once per document list
+@st.cache_data(ttl=30, show_spinner=False)
+def build_table(docs_tuple):
+    """docs_tuple: (document_id, filename, _upload_dt, chunk_count) per document."""
+    raw = pd.DataFrame(
+        list(docs_tuple),
+        columns=["document_id", "filename", "upload_date", "chunk_count"]
+    )
+    
+    # Typed, Arrow-backed columns; dates are formatted by column_config, not per row
+    return pd.DataFrame({
+        "Nombre": pd.array(raw["filename"], dtype="string[pyarrow]"),
+        "Document ID": pd.array(raw["document_id"].str[:8] + "...", dtype="string[pyarrow]"),
+        # Server-local times from the backend; labelling them UTC would shift them
+        "Fecha de Subida": pd.to_datetime(raw["upload_date"]),
+        "Chunks": pd.array(raw["chunk_count"], dtype="int32")
+    })
+
+# Bulk operations: one request per document, issued concurrently
+async def bulk_operation(client, operation, docs):
+    """
+    Reindex or delete every document in docs concurrently.
+    Yields (done, doc, error) as each request finishes
+    (error is None on success). Runs on the background loop, so client
+    is fetched by the caller on the script thread.
+    """
+    semaphore = asyncio.Semaphore(BULK_CONCURRENCY)
+    
+    async def run_one(doc):
+        doc_id = doc.get("document_id", "")
+        async with semaphore:
+            try:
+                if operation == "reindex":
+                    response = await client.post(f"/ingest/reindex/{doc_id}")
+                else:
+                    response = await client.delete(f"/documents/{doc_id}")
+                return doc, None if response.status_code == 200 else response.text
+            except Exception as e:
+                return doc, str(e)
+    
+    tasks = [run_one(doc) for doc in docs]
+    for done, next_result in enumerate(asyncio.as_completed(tasks), start=1):
+        doc, error = await next_result
+        yield done, doc, error
+
+# One document card; its buttons rerun only this card, not the whole page
+@st.fragment
+def render_card(doc):
+    doc_id = doc.get("document_id", "")
+    filename = doc.get("filename", "")
+    chunk_count = doc.get("chunk_count", 0)
+    upload_date = doc.get("_upload_dt")
+    
+    with st.container():
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            st.markdown(f"### 📄 {filename}")
+            st.caption(f"**Document ID:** `{doc_id}`")
+            st.caption(f"**Fecha:** {upload_date.strftime('%Y-%m-%d %H:%M:%S') if upload_date else 'N/A'}")
+            st.caption(f"**Chunks:** {chunk_count}")
+        
+        with col2:
+            # Actions
+            if st.button("ℹ️ Info", key=f"info_{doc_id}", use_container_width=True):
+                with st.expander(f"Detalles de {filename}", expanded=True):
+                    st.json({
+                        "document_id": doc_id,
+                        "filename": filename,
+                        "upload_date": doc.get("upload_date", ""),
+                        "chunk_count": chunk_count
+                    })
+            
+            if st.button("🔄 Reindexar", key=f"reindex_{doc_id}", use_container_width=True):
+                if reindex_document(doc_id, filename):
+                    st.rerun()
+            
+            if st.button("🗑️ Eliminar", key=f"delete_{doc_id}", type="secondary", use_container_width=True):
+                st.session_state[f"confirm_delete_{doc_id}"] = True
+            
+            # Confirm deletion
+            if st.session_state.get(f"confirm_delete_{doc_id}", False):
+                st.warning("¿Estás seguro?")
+                col_yes, col_no = st.columns(2)
+                
+                with col_yes:
+                    if st.button("Sí", key=f"yes_{doc_id}"):
+                        if delete_document(doc_id, filename):
+                            st.session_state[f"confirm_delete_{doc_id}"] = False
+                            st.rerun()
+                
+                with col_no:
+                    if st.button("No", key=f"no_{doc_id}"):
+                        st.session_state[f"confirm_delete_{doc_id}"] = False
+                        st.rerun(scope="fragment")
+        
+        st.markdown("---")
+
 # Refresh button
 col1, col2 = st.columns([4, 1])
 with col2:
     if st.button("🔄 Actualizar", use_container_width=True):
-        st.cache_data.clear()
+        # Only the document caches; other pages' caches are left alone
+        invalidate_documents()
+        load_documents()
         st.rerun()
 
 # Get documents
-documents = get_documents()
+if "documents" not in st.session_state:
+    load_documents()
+documents = st.session_state.documents
+lowercase_names = st.session_state.document_names
 
 if not documents:
     st.info("📭 No hay documentos en el sistema.")
@@ -111,36 +265,47 @@ view_mode = st.radio(
     horizontal=True
 )
 
-# Search and filter
-search_term = st.text_input("🔍 Buscar documento", placeholder="Escribe el nombre del documento...")
+# Search and filter (applied on submit, not on every keystroke)
+with st.form("search_form"):
+    col1, col2 = st.columns([4, 1])
+    
+    with col1:
+        search_term = st.text_input(
+            "🔍 Buscar documento",
+            placeholder="Escribe el nombre del documento...",
+            label_visibility="collapsed"
+        )
+    
+    with col2:
+        st.form_submit_button("🔍 Buscar", use_container_width=True)
 
-# Filter documents
-filtered_docs = documents
+# Filter documents (positions into documents, reused by the table view)
+filtered_idx = list(range(len(documents)))
 if search_term:
-    filtered_docs = [
-        doc for doc in documents 
-        if search_term.lower() in doc.get("filename", "").lower()
-    ]
+    query = search_term.lower()
+    filtered_idx = [i for i, name in enumerate(lowercase_names) if query in name]
+filtered_docs = [documents[i] for i in filtered_idx]
 
 if view_mode == "Tabla":
     # Table view
     if filtered_docs:
-        # Prepare data for table
-        table_data = []
-        for doc in filtered_docs:
-            upload_date = datetime.fromisoformat(doc.get("upload_date", "").replace("Z", "+00:00"))
-            table_data.append({
-                "Nombre": doc.get("filename", ""),
-                "Document ID": doc.get("document_id", "")[:8] + "...",
-                "Fecha de Subida": upload_date.strftime("%Y-%m-%d %H:%M"),
-                "Chunks": doc.get("chunk_count", 0)
-            })
-        
-        df = pd.DataFrame(table_data)
+        # Full table is built once per document list; filtering selects rows
+        df = build_table(tuple(
+            (
+                doc.get("document_id", ""),
+                doc.get("filename", ""),
+                doc.get("_upload_dt"),
+                doc.get("chunk_count", 0)
+            )
+            for doc in documents
+        ))
         st.dataframe(
-            df,
+            df.iloc[filtered_idx],
             use_container_width=True,
-            hide_index=True
+            hide_index=True,
+            column_config={
+                "Fecha de Subida": st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm")
+            }
         )
     else:
         st.warning("No se encontraron documentos con ese criterio de búsqueda.")
@@ -149,55 +314,7 @@ else:
     # Card view
     if filtered_docs:
         for doc in filtered_docs:
-            doc_id = doc.get("document_id", "")
-            filename = doc.get("filename", "")
-            chunk_count = doc.get("chunk_count", 0)
-            upload_date = datetime.fromisoformat(doc.get("upload_date", "").replace("Z", "+00:00"))
-            
-            with st.container():
-                col1, col2 = st.columns([3, 1])
-                
-                with col1:
-                    st.markdown(f"### 📄 {filename}")
-                    st.caption(f"**Document ID:** `{doc_id}`")
-                    st.caption(f"**Fecha:** {upload_date.strftime('%Y-%m-%d %H:%M:%S')}")
-                    st.caption(f"**Chunks:** {chunk_count}")
-                
-                with col2:
-                    # Actions
-                    if st.button("ℹ️ Info", key=f"info_{doc_id}", use_container_width=True):
-                        with st.expander(f"Detalles de {filename}", expanded=True):
-                            st.json({
-                                "document_id": doc_id,
-                                "filename": filename,
-                                "upload_date": doc.get("upload_date", ""),
-                                "chunk_count": chunk_count
-                            })
-                    
-                    if st.button("🔄 Reindexar", key=f"reindex_{doc_id}", use_container_width=True):
-                        if reindex_document(doc_id, filename):
-                            st.rerun()
-                    
-                    if st.button("🗑️ Eliminar", key=f"delete_{doc_id}", type="secondary", use_container_width=True):
-                        st.session_state[f"confirm_delete_{doc_id}"] = True
-                    
-                    # Confirm deletion
-                    if st.session_state.get(f"confirm_delete_{doc_id}", False):
-                        st.warning("¿Estás seguro?")
-                        col_yes, col_no = st.columns(2)
-                        
-                        with col_yes:
-                            if st.button("Sí", key=f"yes_{doc_id}"):
-                                if delete_document(doc_id, filename):
-                                    st.session_state[f"confirm_delete_{doc_id}"] = False
-                                    st.rerun()
-                        
-                        with col_no:
-                            if st.button("No", key=f"no_{doc_id}"):
-                                st.session_state[f"confirm_delete_{doc_id}"] = False
-                                st.rerun()
-                
-                st.markdown("---")
+            render_card(doc)
     else:
         st.warning("No se encontraron documentos con ese criterio de búsqueda.")
 
@@ -214,19 +331,19 @@ with col1:
             status_text = st.empty()
             
             success_count = 0
-            for idx, doc in enumerate(documents):
-                doc_id = doc.get("document_id", "")
-                filename = doc.get("filename", "")
-                status_text.text(f"Reindexando: {filename}")
-                
-                if reindex_document(doc_id, filename):
+            for done, doc, error in iter_async(bulk_operation(get_async_client(API_BASE_URL), "reindex", documents)):
+                status_text.text(f"Reindexado: {doc.get('filename', '')}")
+                if error is None:
                     success_count += 1
-                
-                progress_bar.progress((idx + 1) / len(documents))
+                else:
+                    st.error(f"❌ Error reindexando '{doc.get('filename', '')}': {error}")
+                progress_bar.progress(done / len(documents))
             
             st.success(f"✅ {success_count}/{len(documents)} documentos reindexados exitosamente")
             st.session_state["confirm_reindex_all"] = False
-            st.cache_data.clear()
+            # Every chunk count changed, so reload instead of patching
+            invalidate_documents()
+            load_documents()
         else:
             st.session_state["confirm_reindex_all"] = True
             st.warning("⚠️ Esto reindexará TODOS los documentos. Haz clic de nuevo para confirmar.")
@@ -237,20 +354,18 @@ with col2:
             progress_bar = st.progress(0)
             status_text = st.empty()
             
-            success_count = 0
-            for idx, doc in enumerate(documents):
-                doc_id = doc.get("document_id", "")
-                filename = doc.get("filename", "")
-                status_text.text(f"Eliminando: {filename}")
-                
-                if delete_document(doc_id, filename):
-                    success_count += 1
-                
-                progress_bar.progress((idx + 1) / len(documents))
+            deleted_ids = set()
+            for done, doc, error in iter_async(bulk_operation(get_async_client(API_BASE_URL), "delete", documents)):
+                status_text.text(f"Eliminado: {doc.get('filename', '')}")
+                if error is None:
+                    deleted_ids.add(doc.get("document_id"))
+                else:
+                    st.error(f"❌ Error eliminando '{doc.get('filename', '')}': {error}")
+                progress_bar.progress(done / len(documents))
             
-            st.success(f"✅ {success_count}/{len(documents)} documentos eliminados exitosamente")
+            st.success(f"✅ {len(deleted_ids)}/{len(documents)} documentos eliminados exitosamente")
             st.session_state["confirm_delete_all"] = False
-            st.cache_data.clear()
+            remove_documents(deleted_ids)
             st.rerun()
         else:
             st.session_state["confirm_delete_all"] = True